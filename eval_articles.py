@@ -1,6 +1,5 @@
 
 import csv
-import json
 import os
 import re
 from tqdm import tqdm
@@ -10,6 +9,8 @@ import xml.dom.minidom
 import tensorflow as tf
 from transformers import AutoTokenizer, TFT5ForConditionalGeneration, TFLogitsProcessor, TFAutoModelForSeq2SeqLM, AutoModelForCausalLM, BeamSearchScorer, LogitsProcessor, LogitsProcessorList
 from cleantext import clean
+
+from utils.document_source import DocumentSource, open_source
         
 #tf.config.set_visible_devices([], 'GPU')
 tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-xl")
@@ -82,7 +83,8 @@ def get_subjects(text, prompt):
     prob = float(tf.exp(generated.scores[0]))
     return output, prob
 
-def evaluate_with_t5(corpus_file, y_pred_rules, largeN_year):
+def evaluate_with_t5(corpus, y_pred_rules, largeN_year):
+    # corpus: a DocumentSource (or the path of a snapshot, like eric.json)
     prompt1 = "Does this text introduce a new study that includes several participants? The text must include the number of participants"
     ratio = 1.3  
     prompt2 = "How many people were involved in the investigation?"  
@@ -90,49 +92,57 @@ def evaluate_with_t5(corpus_file, y_pred_rules, largeN_year):
     
     bad_sections = ["introduction", "references", "conclusions"]
 
-    with open(corpus_file, 'rt') as openfile:  # the json file with the eric dataset
-        corpus = json.load(openfile)
-    all_articles = corpus['corpus']
-    total_largeN_using_rules = 0
+    if not isinstance(corpus, DocumentSource):
+        corpus = open_source(corpus)
+    # candidates by title, each id once, so the corpus is read a single time; the rules
+    # total counts candidate ids (not the rows of the rules output)
+    candidates = {}
+    for (article_id, title) in y_pred_rules:
+        if article_id not in candidates.setdefault(title, []):
+            candidates[title].append(article_id)
+    total_largeN_using_rules = len({article_id for ids in candidates.values() for article_id in ids})
     total_largeN_using_T5 = 0
     results = []
+    found = set()
     
-    ok = 1
-    for (article_id, title) in tqdm(y_pred_rules):
-        if article_id not in [x[0] for x in results] and ok == 1:
-            total_largeN_using_rules += 1
-            print("partial results: ")
-            print(article_id, flush=True)
-            print(total_largeN_using_rules, flush=True)
-            print(total_largeN_using_T5, flush=True)
-            for article in all_articles:
-                if article['title'] == title:  # article was considered langeN by rules method
-                    max_n = 0
-                    max_n_paragraph = None
-                    for section in article["sections"]:
-                        heading = section["heading"].lower()
-                        heading = re.sub(r'[^\w\s]', '', heading)
-                        if heading not in bad_sections:  # first filtering after section name
-                            try:
-                                for entry in section["text"]:
-                                    data = entry["paragraph"]
-                                    _, _, rat = is_study(data, prompt1)
-                                    out, prob = get_subjects(data, prompt2)
-                                    
-                                    if rat < ratio:  # second filtering
-                                        n = 0
-                                    elif prob < probability:  # third filtering
-                                        n = 0
-                                    else:
-                                        n = int(out) if out != "" else 0
-                                    if n > max_n:
-                                        max_n = n
-                                        max_n_paragraph = data
-                            except Exception as e:
-                                print(e)
-                    if max_n >= 1000:
-                        results.append((article_id, max_n_paragraph))
-                        total_largeN_using_T5 += 1
+    # articles are matched by title: a source without titles (a SectionStore) raises here
+    for hit in tqdm(corpus.hits(exists=["title"])):
+        article = hit['_source']
+        article_ids = [x for x in candidates.get(article['title'], []) if x not in found]
+        if not article_ids:  # article was not considered largeN by rules method
+            continue
+        print("partial results: ")
+        print(article_ids, flush=True)
+        print(total_largeN_using_rules, flush=True)
+        print(total_largeN_using_T5, flush=True)
+        max_n = 0
+        max_n_paragraph = None
+        for section in article["sections"]:
+            heading = section["heading"].lower()
+            heading = re.sub(r'[^\w\s]', '', heading)
+            if heading not in bad_sections:  # first filtering after section name
+                try:
+                    for entry in section["text"]:
+                        data = entry["paragraph"]
+                        _, _, rat = is_study(data, prompt1)
+                        out, prob = get_subjects(data, prompt2)
+                        
+                        if rat < ratio:  # second filtering
+                            n = 0
+                        elif prob < probability:  # third filtering
+                            n = 0
+                        else:
+                            n = int(out) if out != "" else 0
+                        if n > max_n:
+                            max_n = n
+                            max_n_paragraph = data
+                except Exception as e:
+                    print(e)
+        if max_n >= 1000:
+            for article_id in article_ids:
+                results.append((article_id, max_n_paragraph))
+                found.add(article_id)
+            total_largeN_using_T5 += 1
                     
 
     with open('final_results_' + str(largeN_year) + '.csv', 'w') as g:
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+from examples.extraction import count_pages, count_sections, extract_content
+from parsers.detect import detect_parser
+from parsers.elsevier import ElsevierParser
+from parsers.frontiers import FrontiersParser
+from parsers.generic import GenericParser
+from parsers.ijcsclParser import IjcsclParser
+from parsers.lak_sigcse import LakSigcseParser
+from parsers.springer_conf import SpringerConfParser
+
+# Runs the sample pdfs of every supported layout through extract_content and
+# compares throughput, latency, memory and section counts with a stored baseline.
+# Every sample is also run through detect_parser, which has to pick the parser it is
+# benchmarked with: one sample folder per branch of detect_layout, plus the fallback.
+# The samples in benchmark_pdfs are generated pdfs that mimic the geometry, fonts and
+# first page marks (journal names, footers) of each layout, with random text in place
+# of publisher content. Timings depend on the machine: save a baseline on the machine
+# that compares against it.
+# Usage (from the repository root):
+#   python -m examples.benchmark [--layouts frontiers-new ...] [--save-baseline | --detect-only]
+
+SAMPLES = os.path.join(os.path.dirname(__file__), "benchmark_samples.json")
+BASELINE = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+
+PARSERS = {
+    "ElsevierParser": ElsevierParser,
+    "FrontiersParser": FrontiersParser,
+    "GenericParser": GenericParser,
+    "IjcsclParser": IjcsclParser,
+    "LakSigcseParser": LakSigcseParser,
+    "SpringerConfParser": SpringerConfParser,
+}
+
+# relative slowdown (pages/sec, p50) and memory growth reported as regressions
+TOLERANCE = 0.10
+
+
+def sample_files(sample: Dict[str, Any]) -> List[str]:
+    return sorted(filename for filename in os.listdir(sample["folder"]) if filename.endswith(".pdf"))
+
+
+def check_detection(name: str, sample: Dict[str, Any]) -> List[str]:
+    # a file routed to the wrong parser changes the output of a whole mixed folder
+    problems = []
+    for filename in sample_files(sample):
+        spec = detect_parser(os.path.join(sample["folder"], filename))
+        detected = (spec[0].__name__, spec[1]) if spec else None
+        if detected != (sample["parser"], sample["kwargs"]):
+            problems.append(f"{name}: {filename} detected as {detected}")
+    return problems
+
+
+def run_layout(sample: Dict[str, Any]) -> Dict[str, Any]:
+    # runs in its own process, so the peak rss belongs to this layout alone
+    parser = PARSERS[sample["parser"]](**sample["kwargs"])
+    files = sample_files(sample)
+    latencies = []
+    pages = 0
+    sections = {}
+    for filename in files:
+        pdf_file = os.path.join(sample["folder"], filename)
+        pages += count_pages(pdf_file)
+        start = time.perf_counter()
+        try:
+            sections[filename] = count_sections(extract_content(pdf_file, parser))
+        except Exception as e:
+            sections[filename] = f"error: {type(e).__name__}"
+        latencies.append(time.perf_counter() - start)
+    total = sum(latencies)
+    return {
+        "files": len(files),
+        "pages": pages,
+        "seconds": total,
+        "pages_per_sec": pages / total if total else 0.,
+        "latency_p50": float(np.percentile(latencies, 50)) if latencies else 0.,
+        "latency_p90": float(np.percentile(latencies, 90)) if latencies else 0.,
+        "latency_p99": float(np.percentile(latencies, 99)) if latencies else 0.,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "sections": sections,
+    }
+
+
+def compare(name: str, current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    problems = []
+    if current["pages_per_sec"] < baseline["pages_per_sec"] * (1 - TOLERANCE):
+        problems.append(f"{name}: pages/sec {baseline['pages_per_sec']:.2f} -> {current['pages_per_sec']:.2f}")
+    if current["latency_p50"] > baseline["latency_p50"] * (1 + TOLERANCE):
+        problems.append(f"{name}: p50 latency {baseline['latency_p50']:.3f}s -> {current['latency_p50']:.3f}s")
+    if current["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + TOLERANCE):
+        problems.append(f"{name}: peak rss {baseline['peak_rss_mb']:.0f}MB -> {current['peak_rss_mb']:.0f}MB")
+    for filename in sorted(set(current["sections"]) | set(baseline["sections"])):
+        before, after = baseline["sections"].get(filename), current["sections"].get(filename)
+        if before != after:
+            problems.append(f"{name}: {filename} sections {before} -> {after}")
+    return problems
+
+
+def print_report(results: Dict[str, Dict[str, Any]]):
+    print(f"{'layout':<16}{'files':>6}{'pages':>7}{'pages/s':>9}{'p50':>8}{'p90':>8}{'p99':>8}{'rss MB':>8}{'sections':>9}")
+    for name, r in results.items():
+        sections = sum(count for count in r["sections"].values() if isinstance(count, int))
+        print(f"{name:<16}{r['files']:>6}{r['pages']:>7}{r['pages_per_sec']:>9.2f}{r['latency_p50']:>8.3f}"
+              f"{r['latency_p90']:>8.3f}{r['latency_p99']:>8.3f}{r['peak_rss_mb']:>8.0f}{sections:>9}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--layouts", nargs="*", help="subset of the layouts in benchmark_samples.json")
+    arg_parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    arg_parser.add_argument("--detect-only", action="store_true", help="only check the layout detection")
+    args = arg_parser.parse_args()
+
+    with open(SAMPLES) as f:
+        samples = json.load(f)
+    results = {}
+    misdetected = []
+    for name, sample in samples.items():
+        if args.layouts and name not in args.layouts:
+            continue
+        if not os.path.isdir(sample["folder"]):
+            print(f"{name}: missing sample folder {sample['folder']}")
+            continue
+        misdetected += check_detection(name, sample)
+        if args.detect_only:
+            continue
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results[name] = pool.submit(run_layout, sample).result()
+    for problem in misdetected:
+        print(problem)
+    if args.detect_only or misdetected:
+        sys.exit(1 if misdetected else 0)
+    print_report(results)
+
+    if args.save_baseline:
+        # a layout without sections would make the section comparison check nothing
+        empty = [name for name, r in results.items()
+                 if not any(isinstance(count, int) and count for count in r["sections"].values())]
+        if empty:
+            print(f"no sections found for {', '.join(empty)}: baseline not saved")
+            sys.exit(1)
+        baseline = {}
+        if os.path.exists(BASELINE):
+            with open(BASELINE) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(BASELINE, "w") as f:
+            json.dump(baseline, f, indent=4)
+    elif os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+        problems = [
+            problem
+            for name, current in results.items() if name in baseline
+            for problem in compare(name, current, baseline[name])
+        ]
+        for problem in problems:
+            print(problem)
+        sys.exit(1 if problems else 0)
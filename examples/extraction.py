@@ -0,0 +1,258 @@
+from typing import BinaryIO, Collection, Iterable, Iterator, List, Tuple, Union
+
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LAParams, LTPage, LTTextLine
+from pdfminer.pdfdocument import PDFDocument, PDFNoOutlines
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+from parsers.layout_cache import LayoutCache
+from parsers.page import PageObjects
+from parsers.parser import Parser
+from parsers.section import Paragraph, Section
+from parsers.timing import NULL_TIMER, StageTimer
+from utils.utils import Heading, HeadingIndex
+
+from PyPDF3 import PdfFileReader
+from PyPDF3.generic import Destination
+
+# The pdf to sections part of read_pdf, without elasticsearch: outlines, layout and
+# the parser passes. read_pdf runs it over folders and stores the results,
+# benchmark.py times it on the sample pdfs.
+
+
+def is_centered(line: LTTextLine, left: int, right: int) -> bool:
+    return abs(line.x0 - left) > 50 and abs(line.x1 - right) > 50
+
+
+def enumerate_outlines(outlines: List[Union[Destination, List]], parent_index=None) -> List[Heading]:
+    headings = []
+    heading_index = 0
+    for outline in outlines:
+        if isinstance(outline, Destination):
+            heading_index += 1
+            headings.append(Heading(outline['/Title'], parent_index, heading_index, []))
+        elif isinstance(outline, List):
+            headings[-1].subheadings = enumerate_outlines(outline, heading_index)
+    return headings
+
+
+def get_pdf_outlines(pdf_name):
+    with open(pdf_name, "rb") as f:
+        pdf = PdfFileReader(f, strict=False)
+        if len(pdf.outlines) == 0:
+            return []
+        outlines = enumerate_outlines(pdf.outlines[1:][0])
+        return outlines
+
+
+def number_outlines(outlines: List[Tuple[str, List]], parent_index=None) -> List[Heading]:
+    return [
+        Heading(title, parent_index, heading_index, number_outlines(children, heading_index))
+        for heading_index, (title, children) in enumerate(outlines, 1)
+    ]
+
+
+def get_document_outlines(document: PDFDocument) -> List[Heading]:
+    # same headings as get_pdf_outlines: the bookmarks nested under the first one
+    try:
+        entries = [(level, title) for level, title, *_ in document.get_outlines()]
+    except PDFNoOutlines:
+        return []
+    roots = []
+    stack = []
+    for level, title in entries:
+        node = (title, [])
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        (stack[-1][1][1] if stack else roots).append(node)
+        stack.append((level, node))
+    if not roots:
+        return []
+    return number_outlines(roots[0][1])
+
+
+def open_layout(pdf_file: str, laparams: LAParams = None,
+                page_numbers: Collection[int] = None) -> Tuple[List[Heading], Iterator[LTPage]]:
+    # the pdf is parsed once: outlines are read from the document the pages are laid out from,
+    # PyPDF3 is only used when pdfminer cannot make sense of the bookmarks.
+    # With page_numbers (0 based), only those pages are laid out.
+    fp = open(pdf_file, "rb")
+    try:
+        document = PDFDocument(PDFParser(fp), caching=False)
+        try:
+            heading_list = get_document_outlines(document)
+        except Exception:
+            heading_list = get_pdf_outlines(pdf_file)
+    except:
+        fp.close()
+        raise
+    return heading_list, iter_pages(fp, document, laparams, page_numbers)
+
+
+def iter_pages(fp: BinaryIO, document: PDFDocument, laparams: LAParams = None,
+               page_numbers: Collection[int] = None) -> Iterator[LTPage]:
+    # Same as pdfminer's extract_pages, but memory stays flat with the page count:
+    # the document does not cache resolved objects (that would keep every decoded
+    # content stream alive) and the aggregator drops its reference to the page it
+    # just yielded. Fonts are still cached by the resource manager.
+    with fp:
+        rsrcmgr = PDFResourceManager(caching=True)
+        device = PDFPageAggregator(rsrcmgr, laparams=laparams or LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        last_page = None
+        if page_numbers:
+            # ranges are not walked through: the layout cache asks for open ended ones
+            last_page = page_numbers[-1] if isinstance(page_numbers, range) else max(page_numbers)
+        for i, page in enumerate(PDFPage.create_pages(document)):
+            if page_numbers is not None and i not in page_numbers:
+                if i > last_page:
+                    break
+                continue
+            interpreter.process_page(page)
+            layout = device.get_result()
+            device.result = None
+            yield layout
+
+
+def extract_content(pdf_file: str, parser: Parser, cache: LayoutCache = None,
+                    stop_at_terminal: bool = False, timer: StageTimer = None) -> List[Section]:
+    # with stop_at_terminal, no more pages are laid out once a level 0 heading
+    # declared terminal by the parser (references, acknowledgements, ...) is reached.
+    # A StageTimer collects the time spent in every stage, per file and per page.
+    # tables = extract_tables(pdf_file)
+    timer = timer or NULL_TIMER
+    with timer.stage("prepare"):
+        parser.prepare(pdf_file)
+    with timer.stage("outlines"):
+        heading_list, pages = cache.open_layout(pdf_file, open_layout) if cache else open_layout(pdf_file)
+    return build_sections(heading_list, classify_pages(pages, parser, timer), parser, stop_at_terminal, timer)
+
+
+def classify_pages(pages: Iterator[LTPage], parser: Parser, timer: StageTimer = None,
+                   first_page: int = 0) -> Iterator[PageObjects]:
+    # the laid out pages (numbered from first_page) reduced to what the parser keeps of them;
+    # closing it stops the layout of the remaining pages
+    timer = timer or NULL_TIMER
+    try:
+        for i, page in enumerate(timer.iterate_pages(pages), first_page):
+            if not parser.check_page(page):
+                continue
+            with timer.stage("classify"):
+                objects = parser.classify_page(page, i)
+            # only the classified objects outlive the layout tree from here on
+            del page
+            yield objects
+    finally:
+        # stops pdfminer (and a cache write, which would be incomplete)
+        pages.close()
+
+
+def build_sections(heading_list: List[Heading], pages: Iterable[PageObjects], parser: Parser,
+                   stop_at_terminal: bool = False, timer: StageTimer = None) -> List[Section]:
+    # the sequential part of the extraction: paragraphs continue across pages, so the
+    # classified pages have to come in order, whichever process laid them out
+    timer = timer or NULL_TIMER
+    heading_list = HeadingIndex(heading_list)
+    last_line = None
+    index = 0
+    found_start = False
+    finished = False
+    result: List[Section] = []
+    for objects in pages:
+        for col in range(parser.cols):
+            same_page = False
+            lines = objects.lines[col]
+            if not found_start:
+                j = -1  # an empty column (or one without a start) keeps nothing
+                with timer.stage("headings"):
+                    for j, line in enumerate(lines):
+                        if parser.check_heading(line, heading_list) and parser.heading_level(line) == 0:  # section = None
+                            if stop_at_terminal and parser.is_terminal_heading(line):
+                                finished = True
+                                break
+                            result.append(Section(line))
+                            found_start = True
+                            break
+                lines = lines[(j + 1):]
+                if finished:
+                    break
+            else:
+                with timer.stage("exclude_tables"):
+                    lines = parser.exclude_tables_and_footnotes(lines, objects, col)
+                with timer.stage("exclude_shapes"):
+                    lines = parser.exclude_shapes(lines, objects, col)
+
+            if not lines:
+                continue
+            left, right = objects.geometry.page_limits(lines)
+            # if is_centered(lines[0], left, right) and len(lines[0].get_text().strip()) < 5:
+            #     lines = lines[1:]
+            # if is_centered(lines[-1], left, right) and len(lines[-1].get_text().strip()) < 5:
+            #     lines = lines[:-1]
+            # footnotes = find_footnotes(lines)
+            # if footnotes:
+            #     print(f"page: {i}")
+            # heading checks and paragraph merging are timed per column: a stage per line
+            # would cost more than the work it measures
+            with timer.stage("assemble"):
+                for line in lines:
+                    line_text = parser.get_text(line).lstrip()
+                    if not line_text:
+                        continue
+                    is_heading = parser.check_heading(line, heading_list)
+                    level = parser.heading_level(line) if is_heading else None
+                    if is_heading:  # section = last_section()
+                        if stop_at_terminal and level == 0 and parser.is_terminal_heading(line):
+                            finished = True
+                            break
+                        if not result[-1].add_heading(line, level):
+                            result.append(Section(line))
+                        continue
+                    if result[-1].last_paragraph() is None:
+                        result[-1].append_paragraph(Paragraph(line_text))
+                        last_line = line
+                        same_page = True
+                        continue
+                    # same line
+                    if same_page and line.y1 > last_line.y0 and line.x0 > last_line.x1 \
+                            and result[-1].last_paragraph().endswith("\n"):
+                        result[-1].last_paragraph().pop()
+
+                    if abs(last_line.x1 - right) < 50 and (same_page or last_line.y0 < 100):
+                        # separated word
+                        if not result[-1].last_paragraph().remove_hyphen():
+                            if result[-1].last_paragraph().same_paragraph(line_text):
+                                result[-1].last_paragraph().pop()
+                    if result[-1].last_paragraph().endswith("\n"):
+                        index += 1
+                        result[-1].append_paragraph(Paragraph(line_text))
+                    else:
+                        result[-1].last_paragraph().append(line_text)
+                    last_line = line
+                    same_page = True
+            if finished:
+                break
+        del objects, lines
+        if finished:
+            break
+    if hasattr(pages, "close"):
+        pages.close()
+    for section in result:
+        section.remove_empty()
+    result = [section for section in result if not section.empty()]
+    return result
+
+
+def count_pages(pdf_file: str) -> int:
+    with open(pdf_file, "rb") as fp:
+        document = PDFDocument(PDFParser(fp), caching=False)
+        try:
+            return int(resolve1(resolve1(document.catalog["Pages"])["Count"]))
+        except (KeyError, TypeError, ValueError):
+            return sum(1 for _ in PDFPage.create_pages(document))
+
+
+def count_sections(sections: List[Section]) -> int:
+    return sum(1 + count_sections(section.subsections) for section in sections)
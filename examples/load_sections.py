@@ -0,0 +1,44 @@
+import sys
+import traceback
+
+from console_progressbar import ProgressBar
+from elasticsearch.client import Elasticsearch
+
+from es_config import ES_HOSTNAME, ES_PASS, ES_PORT
+from examples.read_pdf import find_article_id
+from utils.bulk_writer import BulkSectionWriter
+from utils.doi_index import DoiIndex
+from utils.section_store import SectionStore
+
+# Pushes the sections stored by an offline extraction (see extract_folder's store) to es.
+# Usage: python -m examples.load_sections articles/frontiers/sections
+
+if __name__ == "__main__":
+    es = Elasticsearch(
+        hosts=[ES_HOSTNAME],
+        http_auth=('elastic', ES_PASS),
+        scheme="https",
+        port=ES_PORT,
+    )
+    store = SectionStore(sys.argv[1])
+    writer = BulkSectionWriter(es)
+    doi_index = DoiIndex(es)
+    latest = store.latest()
+    errors = []
+    pb = ProgressBar(len(latest))
+
+    def report(indexed, failed):
+        for filename, error in failed:
+            print(f"{filename}: {error}")
+            errors.append(filename)
+
+    for filename, sections in store.records(latest):
+        try:
+            report(*writer.add(filename, find_article_id(filename, es, doi_index), sections))
+        except Exception:
+            print(f"{filename}: {traceback.format_exc()}")
+            errors.append(filename)
+        pb.next()
+    report(*writer.flush())
+    print(len(errors))
+    print(errors)
@@ -1,11 +1,16 @@
+import json
 import os
 import re
+import signal
+import time
 import traceback
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO, StringIO
 from shutil import move
 from tempfile import NamedTemporaryFile
-from typing import Any, BinaryIO, Dict, List, Tuple, Union
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Tuple, Type
 from elasticsearch.client import Elasticsearch
 
 # import camelot
@@ -13,23 +18,32 @@ import numpy as np
 import xmltodict
 # from camelot.core import Table
 from console_progressbar import ProgressBar
-from pdfminer.high_level import extract_pages, extract_text, extract_text_to_fp
-from pdfminer.layout import (LTFigure, LTImage, LTLine, LTPage,
-                             LTTextBoxHorizontal, LTTextLine, LTTextLineHorizontal)
+from pdfminer.high_level import extract_text, extract_text_to_fp
+from pdfminer.layout import LTFigure, LTImage, LTLine, LTPage
 from pdfminer.pdfdocument import PDFDocument
 from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
 from pdfminer.pdfparser import PDFParser
 from es_config import ES_HOSTNAME, ES_PASS, ES_PORT
+from examples.extraction import (build_sections, classify_pages, count_pages, count_sections,
+                                 extract_content, open_layout)
+from parsers.detect import ParserSpec, detect_parser
 from parsers.elsevier import ElsevierParser
 from parsers.frontiers import FrontiersParser
-from parsers.section import Paragraph, Section
+from parsers.layout_cache import LayoutCache
+from parsers.page import PageObjects
+from parsers.section import Section
 from parsers.springer_conf import SpringerConfParser
+from parsers.text_layer import IMAGE, probe_text_layer
+from parsers.timing import StageTimer, combine_timings, merge_timings
 
 from parsers.parser import Parser
+from utils.bulk_writer import BulkSectionWriter
+from utils.doi_index import DoiIndex
+from utils.manifest import Manifest
+from utils.section_store import SectionStore
 from utils.utils import get_entry_by_filename, Heading
 
-from PyPDF3 import PdfFileReader, PdfFileWriter
-from PyPDF3.generic import Destination
+from PyPDF3 import PdfFileWriter
 
 YEAR_REGEX = [
     (re.compile(r"\[\]"), ""),
@@ -40,126 +54,6 @@ YEAR_REGEX = [
 
 heading_pattern = re.compile(r"^([0-9]+(\.)?)+\s*")
 
-class LineWrapper:
-
-    def __init__(self, line: LTTextLineHorizontal):
-        self.inner = line
-
-    def __lt__(self, other):
-        if abs(self.inner.y0 - other.inner.y0) < 2:  # same line
-            return self.inner.x0 < other.inner.x0
-        return self.inner.y0 > other.inner.y0
-
-def detect_page_limits(lines: List[LTTextLine]) -> Tuple[int, int]:
-    c = Counter(round(line.x0 / 10) for line in lines)
-    a, _ = c.most_common(1)[0]
-    c = Counter(round(line.x1 / 10) for line in lines)
-    b, _ = c.most_common(1)[0]
-    return a * 10, b * 10
-
-
-def is_centered(line: LTTextLine, left: int, right: int) -> bool:
-    return abs(line.x0 - left) > 50 and abs(line.x1 - right) > 50
-
-
-def enumerate_outlines(outlines: List[Union[Destination, List]], parent_index=None) -> List[Heading]:
-    headings = []
-    heading_index = 0
-    for outline in outlines:
-        if isinstance(outline, Destination):
-            heading_index += 1
-            headings.append(Heading(outline['/Title'], parent_index, heading_index, []))
-        elif isinstance(outline, List):
-            headings[-1].subheadings = enumerate_outlines(outline, heading_index)
-    return headings
-
-
-def get_pdf_outlines(pdf_name):
-    with open(pdf_name, "rb") as f:
-        pdf = PdfFileReader(f, strict=False)
-        if len(pdf.outlines) == 0:
-            return []
-        outlines = enumerate_outlines(pdf.outlines[1:][0])
-        return outlines
-
-
-def extract_content(pdf_file: str, parser: Parser) -> List[Section]:
-    # tables = extract_tables(pdf_file)
-    pages = list(extract_pages(pdf_file))
-    heading_list = get_pdf_outlines(pdf_file)
-    last_line = None
-    index = 0
-    found_start = False
-    result: List[Section] = []
-    for i, page in enumerate(pages):
-        if not parser.check_page(page):
-            continue
-        for col in range(parser.cols):
-            same_page = False
-            lines = list(sorted(
-                (line
-                 for obj in page
-                 if isinstance(obj, LTTextBoxHorizontal)
-                 for line in obj
-                 if parser.is_horizontal(line) and parser.check_limits(line, i, col)),
-                key=LineWrapper))
-            if not found_start:
-                for j, line in enumerate(lines):
-                    if parser.check_heading(line) and parser.heading_level(line) == 0:  # section = None
-                        result.append(Section(line))
-                        found_start = True
-                        break
-                lines = lines[(j + 1):]
-            else:
-                lines = parser.exclude_tables_and_footnotes(lines, page, col)
-                lines = parser.exclude_shapes(lines, page, col)
-
-            if not lines:
-                continue
-            left, right = detect_page_limits(lines)
-            # if is_centered(lines[0], left, right) and len(lines[0].get_text().strip()) < 5:
-            #     lines = lines[1:]
-            # if is_centered(lines[-1], left, right) and len(lines[-1].get_text().strip()) < 5:
-            #     lines = lines[:-1]
-            # footnotes = find_footnotes(lines)
-            # if footnotes:
-            #     print(f"page: {i}")
-            for line in lines:
-                line_text = line.get_text().lstrip()
-                if not line_text:
-                    continue
-                if parser.check_heading(line):  # section = last_section()
-                    level = parser.heading_level(line)
-                    if not result[-1].add_heading(line, level):
-                        result.append(Section(line))
-                    continue
-                if result[-1].last_paragraph() is None:
-                    result[-1].append_paragraph(Paragraph(line_text))
-                    last_line = line
-                    same_page = True
-                    continue
-                # same line
-                if same_page and line.y1 > last_line.y0 and line.x0 > last_line.x1 \
-                        and result[-1].last_paragraph().endswith("\n"):
-                    result[-1].last_paragraph().pop()
-
-                if abs(last_line.x1 - right) < 50 and (same_page or last_line.y0 < 100):
-                    # separated word
-                    if not result[-1].last_paragraph().remove_hyphen():
-                        if result[-1].last_paragraph().same_paragraph(line_text):
-                            result[-1].last_paragraph().pop()
-                if result[-1].last_paragraph().endswith("\n"):
-                    index += 1
-                    result[-1].append_paragraph(Paragraph(line_text))
-                else:
-                    result[-1].last_paragraph().append(line_text)
-                last_line = line
-                same_page = True
-    for section in result:
-        section.remove_empty()
-    result = [section for section in result if not section.empty()]
-    return result
-
 
 def structure_section(section: Section, result: List[Dict], parent=None):
     index = len(result)
@@ -174,17 +68,328 @@ def structure_section(section: Section, result: List[Dict], parent=None):
         structure_section(subsection, result, parent=index)
 
 
-def update_sections(filename: str, es: Elasticsearch, sections: List[Section]):
-    entry = get_entry_by_filename(filename, es)
-    if not entry:
-        print(f"Not found: {filename}")
-        raise Exception("Article not found")
+def flatten_sections(sections: List[Section]) -> List[Dict]:
     result = []
     for section in sections:
         structure_section(section, result)
+    return result
+
+
+def update_sections(filename: str, es: Elasticsearch, sections: List[Section]):
+    update_section_records(filename, es, flatten_sections(sections))
+
+
+def find_article_id(filename: str, es: Elasticsearch, doi_index: DoiIndex = None) -> str:
+    if doi_index is not None:
+        doc_id = doi_index.get(filename)
+    else:
+        entry = get_entry_by_filename(filename, es)
+        doc_id = entry["_id"] if entry else None
+    if not doc_id:
+        print(f"Not found: {filename}")
+        raise Exception("Article not found")
+    return doc_id
+
+
+def update_section_records(filename: str, es: Elasticsearch, result: List[Dict]):
     # print([(section["heading"], section["index"]) for section in result])
-    entry["_source"]["sections"] = result
-    es.update(index="articles", id=entry["_id"], doc=entry["_source"])
+    # a partial update: the rest of the article is not sent back
+    es.update(index="articles", id=find_article_id(filename, es), doc={"sections": result})
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+# documents with more pages than this are laid out in page ranges by several workers
+SPLIT_PAGES = 150
+RANGE_PAGES = 50
+
+
+# each worker process keeps its own parsers (and cache), built once per layout
+_worker_spec: ParserSpec = None
+_worker_parsers: Dict[Tuple, Parser] = {}
+_worker_cache: LayoutCache = None
+_worker_options: Dict[str, Any] = {}
+_worker_timings = False
+
+
+def _init_worker(parser_cls: Type[Parser], parser_kwargs: Dict[str, Any], cache_dir: str = None,
+                 options: Dict[str, Any] = None, timings: bool = False):
+    global _worker_spec, _worker_cache, _worker_options, _worker_timings
+    _worker_spec = (parser_cls, parser_kwargs) if parser_cls else None
+    _worker_cache = LayoutCache(cache_dir) if cache_dir else None
+    _worker_options = options or {}
+    _worker_timings = timings
+
+
+def _get_parser(spec: ParserSpec) -> Parser:
+    parser_cls, parser_kwargs = spec
+    key = (parser_cls, tuple(sorted(parser_kwargs.items())))
+    if key not in _worker_parsers:
+        _worker_parsers[key] = parser_cls(**parser_kwargs)
+    return _worker_parsers[key]
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _run_task(pdf_file: str, timeout: int, task: Callable[[StageTimer, Dict[str, Any]], Tuple[str, Any]]
+              ) -> Tuple[str, str, Any, Dict[str, Any]]:
+    # runs task(timer, stats) -> (status, result) under the timeout, failures become statuses
+    timer = StageTimer() if _worker_timings else None
+    stats = {}
+    start = time.perf_counter()
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(timeout)
+    try:
+        status, result = task(timer, stats)
+        return pdf_file, status, result, stats
+    except ExtractionTimeout:
+        return pdf_file, "timeout", f"Timed out after {timeout}s", stats
+    except Exception:
+        return pdf_file, "error", traceback.format_exc(), stats
+    finally:
+        signal.alarm(0)
+        stats["duration"] = time.perf_counter() - start
+        if timer:
+            # also kept for timeouts, which are the files worth looking at
+            stats["timings"] = timer.to_dict()
+
+
+def _extract_file(pdf_file: str, timeout: int, split_pages: int = 0) -> Tuple[str, str, Any, Dict[str, Any]]:
+    def task(timer: StageTimer, stats: Dict[str, Any]) -> Tuple[str, Any]:
+        # scans without a text layer are not worth a layout pass (blank first pages are laid
+        # out anyway: text may still come later, and without it the file ends up empty)
+        stats["text_layer"] = probe_text_layer(pdf_file)
+        if stats["text_layer"] == IMAGE:
+            return "empty", []
+        # without a fixed parser, the layout of every file is detected from its first page
+        spec = _worker_spec or detect_parser(pdf_file)
+        if spec is None:
+            return "error", "Unknown publisher layout"
+        parser = _get_parser(spec)
+        stats["parser"] = type(parser).__name__
+        if split_pages:
+            num_pages = count_pages(pdf_file)
+            if num_pages > split_pages:
+                return "split", (spec, num_pages)
+        sections = extract_content(pdf_file, parser, _worker_cache, timer=timer, **_worker_options)
+        stats["sections"] = count_sections(sections)
+        return "done" if sections else "empty", sections
+
+    return _run_task(pdf_file, timeout, task)
+
+
+def _classify_range(pdf_file: str, spec: ParserSpec, first: int, last: int,
+                    timeout: int) -> Tuple[str, str, Any, Dict[str, Any]]:
+    # lays out and classifies pages [first, last) of a long document, the sections are
+    # built by the batch driver once every range is back
+    def task(timer: StageTimer, stats: Dict[str, Any]) -> Tuple[str, Any]:
+        parser = _get_parser(spec)
+        parser.prepare(pdf_file)
+        heading_list, pages = open_layout(pdf_file, page_numbers=range(first, last))
+        return "done", (first, heading_list, list(classify_pages(pages, parser, timer, first)), parser)
+
+    return _run_task(pdf_file, timeout, task)
+
+
+class SplitDocument:
+    # a long document whose page ranges are laid out by several workers
+
+    def __init__(self, pdf_file: str, stats: Dict[str, Any], ranges: int):
+        self.pdf_file = pdf_file
+        self.stats = stats
+        self.remaining = ranges
+        self.failed = False
+        self.parts: Dict[int, Tuple[List[Heading], List[PageObjects], Parser]] = {}
+        self.timings: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, status: str, result: Any, stats: Dict[str, Any]) -> Tuple[str, str, Any, Dict[str, Any]]:
+        # the outcome of the file if this range failed it (only the first failure counts)
+        self.remaining -= 1
+        self.stats["duration"] += stats["duration"]
+        if self.failed:
+            return None
+        if status != "done":
+            self.failed = True
+            return self.pdf_file, status, result, self.stats
+        first, heading_list, pages, parser = result
+        self.parts[first] = heading_list, pages, parser
+        if "timings" in stats:
+            self.timings[first] = stats["timings"]
+        return None
+
+    def finish(self, **options) -> Tuple[str, str, Any, Dict[str, Any]]:
+        # every range is back: the sections are built here, in page order
+        firsts = sorted(self.parts)
+        heading_list, _, parser = self.parts[firsts[0]]
+        pages = (page for first in firsts for page in self.parts[first][1])
+        if self.timings:
+            self.stats["timings"] = combine_timings([self.timings[first] for first in firsts])
+        try:
+            sections = build_sections(heading_list, pages, parser, **options)
+        except Exception:
+            return self.pdf_file, "error", traceback.format_exc(), self.stats
+        finally:
+            self.parts = {}
+        self.stats["sections"] = count_sections(sections)
+        return self.pdf_file, "done" if sections else "empty", sections, self.stats
+
+
+def extract_batch(files: List[str], parser_cls: Type[Parser], parser_kwargs: Dict[str, Any] = None,
+                  workers: int = None, timeout: int = 300, cache_dir: str = None, timings: bool = False,
+                  split_pages: int = SPLIT_PAGES, **options) -> Iterator[Tuple[str, str, Any, Dict[str, Any]]]:
+    # yields (file, status, result, stats) as files finish; status is one of done/empty/timeout/error.
+    # stats has the text layer (see probe_text_layer), the parser name, the duration and
+    # the section count, when known. Files without a text layer come back empty, unparsed.
+    # When parser_cls is None the parser is picked per file, so mixed folders work in one pass.
+    # Documents of more than split_pages pages (0 never splits) are laid out in ranges of
+    # RANGE_PAGES pages by several workers and bypass the layout cache; timeout applies per range.
+    # With timings, stats["timings"] holds the per stage times of the file (see StageTimer).
+    # Other keyword options (e.g. stop_at_terminal) are passed on to extract_content.
+    # Only as many tasks as workers are in flight: when a worker dies (oom killer, segfault),
+    # the pool breaks and those files come back as errors, then a new pool takes the rest.
+    max_workers = workers or os.cpu_count()
+
+    def new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                   initargs=(parser_cls, parser_kwargs or {}, cache_dir, options, timings))
+
+    queue = deque((_extract_file, (pdf_file, timeout, split_pages)) for pdf_file in files)
+    pending: Dict[Future, str] = {}
+    splits: Dict[str, SplitDocument] = {}
+
+    def outcome(pdf_file: str, status: str, result: Any, stats: Dict[str, Any]
+                ) -> Tuple[str, str, Any, Dict[str, Any]]:
+        # the outcome of a file once it is known, None while ranges of it are out
+        if status == "split":
+            spec, num_pages = result
+            firsts = range(0, num_pages, RANGE_PAGES)
+            splits[pdf_file] = SplitDocument(pdf_file, stats, len(firsts))
+            # the ranges go first, so a split document is not held longer than needed
+            queue.extendleft(reversed([(_classify_range, (pdf_file, spec, first, min(first + RANGE_PAGES, num_pages),
+                                                          timeout)) for first in firsts]))
+            return None
+        if pdf_file not in splits:
+            return pdf_file, status, result, stats
+        document = splits[pdf_file]
+        result = document.add(status, result, stats)
+        if not document.remaining:
+            del splits[pdf_file]
+            if not document.failed:
+                result = document.finish(**options)
+        return result
+
+    pool = new_pool()
+    try:
+        while queue or pending:
+            while queue and len(pending) < max_workers:
+                task, args = queue.popleft()
+                pending[pool.submit(task, *args)] = args[0]
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                pdf_file = pending.pop(future)
+                try:
+                    result = outcome(*future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    result = outcome(pdf_file, "error", "Worker process died", {"duration": 0.})
+                if result:
+                    yield result
+            if broken:
+                # the other tasks in flight died with the pool
+                for future, pdf_file in list(pending.items()):
+                    del pending[future]
+                    result = outcome(pdf_file, "error", "Worker process died", {"duration": 0.})
+                    if result:
+                        yield result
+                pool.shutdown(wait=True)
+                pool = new_pool()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def extract_folder(folder: str, es: Elasticsearch, parser_cls: Type[Parser], parser_kwargs: Dict[str, Any] = None,
+                   workers: int = None, timeout: int = 300, cache_dir: str = None, timings: bool = False,
+                   manifest: Manifest = None, store: SectionStore = None, doi_index: DoiIndex = None,
+                   **options) -> List[str]:
+    # With a store, sections are written there instead of to es (see examples/load_sections.py),
+    # otherwise they are sent in bulk; files count as done once es confirmed their update.
+    # With a manifest, files stay where they are: finished files (by content) are skipped
+    # and failed ones retried, every outcome is recorded in the manifest instead.
+    # Without one, empty and failed files are moved to {folder}-empty and {folder}-errors.
+    # With timings, the aggregate of the run is written to {folder}-timings.json
+    empty_folder = f"{folder}-empty"
+    errors_folder = f"{folder}-errors"
+    files = [os.path.join(folder, filename) for filename in os.listdir(folder) if not filename.startswith(".")]
+    hashes = {}
+    if manifest:
+        hashes = dict(manifest.pending(files))
+        files = list(hashes)
+    errors = []
+    file_timings = {}
+    text_layers = Counter()
+    writer = None if store else BulkSectionWriter(es)
+    if doi_index is None and not store:
+        doi_index = DoiIndex(es)  # loaded by the first lookup, share one across folders
+    buffered: Dict[str, Dict[str, Any]] = {}  # stats of the files whose sections the writer holds
+
+    def finish(pdf_file: str, status: str, result: Any, stats: Dict[str, Any]):
+        filename = os.path.basename(pdf_file)
+        if status not in ("done", "empty"):
+            print(f"{filename}: {result}")
+            errors.append(filename)
+        if manifest:
+            manifest.record(hashes[pdf_file], pdf_file, status, stats.get("parser"), stats.get("duration"),
+                            stats.get("sections"), None if status in ("done", "empty") else result,
+                            stats.get("text_layer"))
+        elif status == "empty":
+            os.makedirs(empty_folder, exist_ok=True)
+            os.rename(pdf_file, os.path.join(empty_folder, filename))
+        elif status != "done":
+            os.makedirs(errors_folder, exist_ok=True)
+            os.rename(pdf_file, os.path.join(errors_folder, filename))
+
+    def confirm(indexed: List[str], failed: List[Tuple[str, str]]):
+        for pdf_file in indexed:
+            finish(pdf_file, "done", None, buffered.pop(pdf_file))
+        for pdf_file, error in failed:
+            finish(pdf_file, "error", error, buffered.pop(pdf_file))
+
+    pb = ProgressBar(len(files))
+    try:
+        for pdf_file, status, result, stats in extract_batch(files, parser_cls, parser_kwargs, workers, timeout,
+                                                             cache_dir, timings, **options):
+            filename = os.path.basename(pdf_file)
+            text_layers[stats.get("text_layer")] += 1
+            if "timings" in stats:
+                file_timings[filename] = stats["timings"]
+            if status == "done":
+                try:
+                    if store:
+                        store.append(filename, flatten_sections(result))
+                    else:
+                        doc_id = find_article_id(filename, es, doi_index)
+                        buffered[pdf_file] = stats
+                        confirm(*writer.add(pdf_file, doc_id, flatten_sections(result)))
+                        pb.next()
+                        continue
+                except Exception:
+                    status, result = "error", traceback.format_exc()
+            finish(pdf_file, status, result, stats)
+            pb.next()
+    finally:
+        # also when the run is interrupted: what was extracted is not lost
+        if writer:
+            confirm(*writer.flush())
+    print(f"text layers: {dict(text_layers)}")
+    if timings:
+        with open(f"{folder}-timings.json", "w") as f:
+            json.dump(merge_timings(file_timings), f, indent=4)
+    return errors
 
 
 if __name__ == "__main__":
@@ -195,34 +400,27 @@ if __name__ == "__main__":
         port=ES_PORT,
     )
     conf_abbr = "frontiers"
-    parser = FrontiersParser(old_version=False)
+    parser_cls, parser_kwargs = FrontiersParser, {"old_version": False}  # None, {} detects the parser per file
+    workers = os.cpu_count()
+    timeout = 300  # seconds per file
+    cache_dir = None  # e.g. "layout-cache", to replay pdfminer layouts when only the parser changes
+    stop_at_terminal = False  # True skips references and what follows them (and their layout)
+    timings = False  # writes per stage times of every file to {folder}-timings.json
+    manifest = Manifest(f"articles/{conf_abbr}/manifest.sqlite")  # None moves empty/failed files instead
+    store = None  # e.g. SectionStore(f"articles/{conf_abbr}/sections"), loaded into es by examples/load_sections.py
+    doi_index = DoiIndex(es, path="articles/doi_index.json")  # delete the file to reload the map from es
     errors = []
     for year in [2015]:
-        folder = f"articles/{conf_abbr}/{year}"
         print(year)
         folder = f"articles/{conf_abbr}/{year}"
-        empty_folder = f"articles/{conf_abbr}/{year}-empty"
-        errors_folder = f"articles/{conf_abbr}/{year}-errors"
-        files = [filename for filename in os.listdir(folder) if not filename.startswith(".")] 
-        pb = ProgressBar(len(files))
-        for filename in files:
-            # if filename != "fpsyg.2011.00262.pdf":
-            #     continue
-            print(filename)
-            # with open(os.path.join(folder, filename), "rb") as f:
-            try:
-                sections = extract_content(os.path.join(folder, filename), parser)
-                if not sections:
-                    os.makedirs(empty_folder, exist_ok=True)
-                    os.rename(os.path.join(folder, filename), os.path.join(empty_folder, filename))
-                else:
-                    update_sections(filename, es, sections)
-            except KeyboardInterrupt:
-                exit()
-            except:
-                os.makedirs(errors_folder, exist_ok=True)
-                os.rename(os.path.join(folder, filename), os.path.join(errors_folder, filename))
-                errors.append(filename)
-            pb.next()
+        errors += extract_folder(folder, es, parser_cls, parser_kwargs, workers, timeout, cache_dir, timings,
+                                 manifest, store, doi_index, stop_at_terminal=stop_at_terminal)
     print(len(errors))
     print(errors)
+    if store:
+        store.close()
+    doi_index.save()
+    if manifest:
+        print(dict(manifest.summary()))
+        print(dict(manifest.summary("text_layer")))
+        manifest.close()
@@ -5,9 +5,12 @@ import csv
 import os
 import ast
 import requests
+import sys
 from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
 import spacy
 from tensorflow_hub import text_embedding_column
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # run from this folder
+from utils.document_source import ElasticsearchSource, open_source
 nlp = spacy.load('en_core_web_lg')
 
 
@@ -19,37 +22,10 @@ def get_ref_entities():
 
 ref_entities = get_ref_entities()
 
-def get_all_ids_from_n1000(es, conf_abbr=None):
+def get_all_ids_from_n1000(n1000, conf_abbr=None):
     if conf_abbr:
-        query = {"_source": [], "size": 100, 
-                    "query": {
-                        "bool": {
-                            "must": [
-                                { "term": {"conf_abbr": conf_abbr} }
-                            ]
-                        }
-                    } 
-                }
-    else:
-        query = {"_source": [], "size": 100, 
-                "query": {
-                    "match_all": {}
-                }
-            }
-
-    res = es.search(index='n1000', body=query, scroll='60s', request_timeout=60)
-    scroll_id = res['_scroll_id']
-
-    ids = set()
-    for i, hit in enumerate(res['hits']['hits']):
-        ids.add(hit['_id'])
-    
-    while len(res['hits']['hits']):
-        res = es.scroll(scroll_id=scroll_id, scroll='60s')
-        for i, hit in enumerate(res['hits']['hits']):
-            ids.add(hit['_id'])
-
-    return ids
+        return set(n1000.ids(terms={"conf_abbr": conf_abbr}))
+    return set(n1000.ids())
 
 
 def build_parent_graph(sections):
@@ -61,79 +37,41 @@ def build_parent_graph(sections):
     return graph
 
 
-def get_all_id_heading_text(es, conf_abbr=None):
+def get_hit_heading_text(hit):
+    source = hit['_source']
+    indices_of_interesting_sections = {}
+    for section in source['sections']:
+        heading = section['heading'].lower()
+        if heading.startswith('meth') or heading.startswith('participa') or heading.startswith('cor') or \
+            'method' in heading or ('material' in heading and 'supplementary' not in heading) or 'participant' in heading or 'study' in heading or \
+            'sample' in heading or 'result' in heading or 'data' in heading:
+            indices_of_interesting_sections[section['index']] = [heading, section['text']]
+    sections_parent_graph = build_parent_graph(source['sections'])
+    for section in source['sections']:
+        if section['index'] in indices_of_interesting_sections:
+            continue
+        for parent in sections_parent_graph[section['index']]:
+            if parent in indices_of_interesting_sections:
+                indices_of_interesting_sections[parent][1] += ' ' + section['text']
+    heading_and_text = []
+    for _, (heading, text) in indices_of_interesting_sections.items():
+        if text:
+            heading_and_text.append((hit['_id'], heading, text))
+    if source.get('abstract', None):
+        heading_and_text.append((hit['_id'], 'abstract', source['abstract']))
+    return heading_and_text
+
+
+def get_all_id_heading_text(articles, conf_abbr=None):
+    fields = ["abstract", "sections.heading", "sections.text", "sections.index", "sections.parent"]
     if conf_abbr:
-        query = {"_source": ["abstract", "sections.heading", "sections.text", "sections.index", "sections.parent"], "size": 100, 
-                    "query": {
-                        "bool": {
-                            "must": [
-                                { "exists": {"field": "sections"} },
-                                { "term": {"conf_abbr": conf_abbr} }
-                            ]
-                        }
-                    } 
-                }
+        hits = articles.hits(fields, exists=["sections"], terms={"conf_abbr": conf_abbr})
     else:
-        query = {"_source": ["abstract", "sections.heading", "sections.text", "sections.index", "sections.parent"], "size": 100, 
-                "query": {
-                    "bool": {
-                        "must": [
-                            { "exists": {"field": "sections"} },
-                        ]
-                    }
-                } 
-            }
-
-    res = es.search(index='articles', body=query, scroll='60s', request_timeout=60)
-    scroll_id = res['_scroll_id']
+        hits = articles.hits(fields, exists=["sections"])
 
     heading_and_text = []
-    for i, hit in enumerate(res['hits']['hits']):
-        source = hit['_source']
-        indices_of_interesting_sections = {}
-        for section in source['sections']:            
-            heading = section['heading'].lower()
-            if heading.startswith('meth') or heading.startswith('participa') or heading.startswith('cor') or \
-                'method' in heading or ('material' in heading and 'supplementary' not in heading) or 'participant' in heading or 'study' in heading or \
-                'sample' in heading or 'result' in heading or 'data' in heading:
-                indices_of_interesting_sections[section['index']] = [heading, section['text']]
-        sections_parent_graph = build_parent_graph(source['sections'])
-        for section in source['sections']:
-            if section['index'] in indices_of_interesting_sections:
-                continue
-            for parent in sections_parent_graph[section['index']]:
-                if parent in indices_of_interesting_sections:
-                    indices_of_interesting_sections[parent][1] += ' ' + section['text']
-        for _, (heading, text) in indices_of_interesting_sections.items():
-            if text:
-                heading_and_text.append((hit['_id'], heading, text))
-        if source['abstract']:
-            heading_and_text.append((hit['_id'], 'abstract', source['abstract']))
-    
-    while len(res['hits']['hits']):
-        res = es.scroll(scroll_id=scroll_id, scroll='60s')
-        for i, hit in enumerate(res['hits']['hits']):
-            source = hit['_source']
-            indices_of_interesting_sections = {}
-            for section in source['sections']:            
-                heading = section['heading'].lower()
-                if heading.startswith('meth') or heading.startswith('participa') or heading.startswith('cor') or \
-                    'method' in heading or ('material' in heading and 'supplementary' not in heading) or 'participant' in heading or 'study' in heading or \
-                    'sample' in heading or 'result' in heading or 'data' in heading:
-                    indices_of_interesting_sections[section['index']] = [heading, section['text']]
-            sections_parent_graph = build_parent_graph(source['sections'])
-            for section in source['sections']:
-                if section['index'] in indices_of_interesting_sections:
-                    continue
-                for parent in sections_parent_graph[section['index']]:
-                    if parent in indices_of_interesting_sections:
-                        indices_of_interesting_sections[parent][1] += ' ' + section['text']
-            for _, (heading, text) in indices_of_interesting_sections.items():
-                if text:
-                    heading_and_text.append((hit['_id'], heading, text))
-            if source['abstract']:
-                heading_and_text.append((hit['_id'], 'abstract', source['abstract']))
-
+    for hit in hits:
+        heading_and_text.extend(get_hit_heading_text(hit))
     return heading_and_text
 
 
@@ -285,9 +223,9 @@ def get_parts_of_texts_with_numbers(id_heading_text):
     return results
 
 
-def main_extract_n1000_with_duckling(es):
-    id_heading_text = get_all_id_heading_text(es)
-    already_processed = get_all_ids_from_n1000(es)
+def main_extract_n1000_with_duckling(articles, n1000):
+    id_heading_text = get_all_id_heading_text(articles)
+    already_processed = get_all_ids_from_n1000(n1000)
     id_heading_text = [x for x in id_heading_text if x[0] not in already_processed]
     certain_n_1000 = get_sections_with_numbers(id_heading_text)
     certain_ids = set([id for id, heading, text in certain_n_1000])
@@ -305,9 +243,9 @@ def main_extract_n1000_with_duckling(es):
         csv_writer.writerows(results)
 
 
-def main_extract_n1000(es):
-    id_heading_text = get_all_id_heading_text(es)
-    already_processed = get_all_ids_from_n1000(es)
+def main_extract_n1000(articles, n1000):
+    id_heading_text = get_all_id_heading_text(articles)
+    already_processed = get_all_ids_from_n1000(n1000)
     id_heading_text = [x for x in id_heading_text if x[0] not in already_processed]
     certain_n_1000 = get_sections_with_numbers(id_heading_text)
     certain_ids = set([id for id, heading, text in certain_n_1000])
@@ -320,7 +258,7 @@ def main_extract_n1000(es):
                 csv_writer.writerow([id, heading, [t]])
 
 specific_id_to_class = {}
-def main_test(es):
+def main_test(articles):
     specific_ids = []
     with open('corpus.csv', 'r') as f:
         for line in f.readlines():
@@ -329,7 +267,7 @@ def main_test(es):
             specific_id_to_class[id] = int(class_)
             specific_ids.append(id)
     test_results = {}
-    id_heading_text = get_all_id_heading_text(es)
+    id_heading_text = get_all_id_heading_text(articles)
     certain_n_1000 = get_sections_with_numbers(id_heading_text)
 
     certain_ids = set([id for id, heading, text in certain_n_1000])
@@ -398,12 +336,18 @@ def compute_confusion_matrix():
 
 
 if __name__ == '__main__':
-    es = Elasticsearch(
-        hosts=None,
-        http_auth=None,
-        scheme=None,
-        port=None,
-    ) # hidden for security reasons
-    
-    main_test(es)
+    if len(sys.argv) > 1:
+        # a local snapshot of the articles (see utils.document_source.write_snapshot): no es needed.
+        # A SectionStore folder needs the file -> _id map of a DoiIndex to match the ids of corpus.csv
+        articles = open_source(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        es = Elasticsearch(
+            hosts=None,
+            http_auth=None,
+            scheme=None,
+            port=None,
+        ) # hidden for security reasons
+        articles = ElasticsearchSource(es, 'articles')
+
+    main_test(articles)
     compute_confusion_matrix()
\ No newline at end of file
@@ -4,10 +4,12 @@ import re
 import csv
 import os
 import ast
+import itertools
 import requests
 import spacy
 import eval_articles
 import sys
+from utils.document_source import ElasticsearchSource, open_source
 nlp = spacy.load('en_core_web_lg')
 
 
@@ -29,86 +31,62 @@ def build_parent_graph(sections):
     return graph
 
 
-def get_all_id_heading_text(es):
-    query = {"_source": ["description", "sections.heading", "sections.text", "sections.index", "sections.parent", "title"], "size": 100,
-            "query": {
-                "bool": {
-                    "must": [
-                        { "exists": {"field": "sections"} },   
-                        { "match": {
-                            "publicationdateyear": {
-                                "query": str(largeN_year) + "/01/01 00:00:00"
-                            }
-                        } }
-                    ]
-                }
-            } 
-        }
-
-    res = es.search(index='eric-articles', body=query, scroll='60s', request_timeout=60)
-    scroll_id = res['_scroll_id']
-
+def get_hit_heading_text(hit):
+    # (id, heading, text, title) of the interesting sections of an article (the text of
+    # their subsections included) and of its description
+    source = hit['_source']
+    indices_of_interesting_sections = {}
+    for section in source['sections']:
+        heading = section['heading'].lower()
+        if heading.startswith('meth') or heading.startswith('participa') or heading.startswith('cor') or \
+            'method' in heading or ('material' in heading and 'supplementary' not in heading) or 'participant' in heading or 'study' in heading or \
+            'sample' in heading or 'result' in heading or 'data' in heading:
+            indices_of_interesting_sections[section['index']] = [heading, section['text']]
+    sections_parent_graph = build_parent_graph(source['sections'])
+    for section in source['sections']:
+        if section['index'] in indices_of_interesting_sections:
+            continue
+        for parent in sections_parent_graph[section['index']]:
+            if parent in indices_of_interesting_sections:
+                indices_of_interesting_sections[parent][1] += ' ' + section['text']
     heading_and_text = []
-    for i, hit in enumerate(res['hits']['hits']):
-        source = hit['_source']
-        indices_of_interesting_sections = {}
-        for section in source['sections']:            
-            heading = section['heading'].lower()
-            if heading.startswith('meth') or heading.startswith('participa') or heading.startswith('cor') or \
-                'method' in heading or ('material' in heading and 'supplementary' not in heading) or 'participant' in heading or 'study' in heading or \
-                'sample' in heading or 'result' in heading or 'data' in heading:
-                indices_of_interesting_sections[section['index']] = [heading, section['text']]
-        sections_parent_graph = build_parent_graph(source['sections'])
-        for section in source['sections']:
-            if section['index'] in indices_of_interesting_sections:
-                continue
-            for parent in sections_parent_graph[section['index']]:
-                if parent in indices_of_interesting_sections:
-                    indices_of_interesting_sections[parent][1] += ' ' + section['text']
-        for _, (heading, text) in indices_of_interesting_sections.items():
-            if text:
-                heading_and_text.append((hit['_id'], heading, text, source['title']))
-        if source['description']:
-            heading_and_text.append((hit['_id'], 'description', source['description'], source['title']))
-    
-    while len(res['hits']['hits']):
-        res = es.scroll(scroll_id=scroll_id, scroll='60s')
-        for i, hit in enumerate(res['hits']['hits']):
-            source = hit['_source']
-            indices_of_interesting_sections = {}
-            for section in source['sections']:            
-                heading = section['heading'].lower()
-                if heading.startswith('meth') or heading.startswith('participa') or heading.startswith('cor') or \
-                    'method' in heading or ('material' in heading and 'supplementary' not in heading) or 'participant' in heading or 'study' in heading or \
-                    'sample' in heading or 'result' in heading or 'data' in heading:
-                    indices_of_interesting_sections[section['index']] = [heading, section['text']]
-            sections_parent_graph = build_parent_graph(source['sections'])
-            for section in source['sections']:
-                if section['index'] in indices_of_interesting_sections:
-                    continue
-                for parent in sections_parent_graph[section['index']]:
-                    if parent in indices_of_interesting_sections:
-                        indices_of_interesting_sections[parent][1] += ' ' + section['text']
-            for _, (heading, text) in indices_of_interesting_sections.items():
-                if text:
-                    heading_and_text.append((hit['_id'], heading, text, source['title']))  
-            if source.get('description', None):
-                heading_and_text.append((hit['_id'], 'description', source['description'], source['title']))
-
-    print("Total articles per year: " + str(len(heading_and_text)))
+    for _, (heading, text) in indices_of_interesting_sections.items():
+        if text:
+            heading_and_text.append((hit['_id'], heading, text, source['title']))
+    if source.get('description', None):
+        heading_and_text.append((hit['_id'], 'description', source['description'], source['title']))
     return heading_and_text
 
 
+def get_all_id_heading_text(documents):
+    # a generator: sections are handed on as the source reads them, one article after another
+    fields = ["description", "sections.heading", "sections.text", "sections.index", "sections.parent", "title"]
+    for hit in documents.hits(fields, exists=["sections"], publicationdateyear=str(largeN_year) + "/01/01 00:00:00"):
+        yield from get_hit_heading_text(hit)
+
+
+r_large_n = re.compile(r"[Nn]\s?=\s?[0-9]{3}[0-9]+")
+r_large_n_commas = re.compile(r"[Nn]\s?=\s?[0-9]+(,[0-9]{3})+")
+
+
+def has_large_n(text):
+    return r_large_n.search(text) is not None or r_large_n_commas.search(text) is not None
+
+
 def get_sections_with_numbers(id_heading_text):
-    r = re.compile(r"[Nn]\s?=\s?[0-9]{3}[0-9]+")
-    r2 = re.compile(r"[Nn]\s?=\s?[0-9]+(,[0-9]{3})+")
-    results = []
-    for id, heading, text, title in id_heading_text:
-        if r.search(text):
-            results.append((id, heading, text, title))
-        elif r2.search(text):
-            results.append((id, heading, text, title))
-    return results
+    return [(id, heading, text, title) for id, heading, text, title in id_heading_text if has_large_n(text)]
+
+
+def filter_certain_articles(id_heading_text, certain_ids):
+    # the sections of the articles without a certain large N (N = 1000 or more in one of
+    # their sections); the ids of the others go to certain_ids. The sections of an
+    # article come one after another, so only one article is held at a time.
+    for id, sections in itertools.groupby(id_heading_text, key=lambda x: x[0]):
+        sections = list(sections)
+        if any(has_large_n(text) for _, _, text, _ in sections):
+            certain_ids.add(id)
+        else:
+            yield from sections
 
 
 def remove_copyright(id_heading_text):
@@ -144,6 +122,7 @@ def remove_year_from_inside_parathesis(id_heading_text):
 
 
 def remove_irrelevent_4_numbers(id_heading_text):
+    # yields the sections with the numbers that are not sample sizes removed from their text
     r_copyright = re.compile(r"©\s?[0-9]{4}")
     r_in_year = re.compile(r"[iI]n [0-9]{4}")
     r_in_citations_with_comma = re.compile(r",\s*[0-9]{4}")
@@ -167,8 +146,7 @@ def remove_irrelevent_4_numbers(id_heading_text):
     r_metrics = re.compile(r"(W|SD|M)\s.\s[0-9]+(,*[0-9])+")
     r_F = re.compile(r"F[0-9]+(,*[0-9])+")
     r_numbers_one_after_another = re.compile(r"([0-9]+[^a-zA-Z0-9,]+[0-9]+)+")
-    for i, e in enumerate(id_heading_text):
-        id, heading, text, title = e
+    for id, heading, text, title in id_heading_text:
         text = re.sub(r_copyright, '', text)
         text = re.sub(r_in_year, '', text)
         text = re.sub(r_in_citations_with_comma, '', text)
@@ -192,7 +170,7 @@ def remove_irrelevent_4_numbers(id_heading_text):
         text = re.sub(r_metrics, '', text)
         text = re.sub(r_F, '', text)
         text = re.sub(r_numbers_one_after_another, '', text)
-        id_heading_text[i] = (id, heading, text, title)
+        yield id, heading, text, title
 
 
 def get_parts_for_a_re(r, id, heading, text, results, title):
@@ -234,49 +212,42 @@ def get_parts_of_texts_with_numbers(id_heading_text):
     r1 = re.compile(r"[=|\s][1-9][0-9]{2}[0-9]+[\W]")
     r2 = re.compile(r"[0-9]+(,[0-9]{3})+[\W]")
     r3 = re.compile(r"[T|t]housand|[M|m]illion|[B|b]illion")
-    results = []
     count = 0
-    length = len(id_heading_text)
     for id, heading, text, title in id_heading_text:
         count += 1
+        results = []
         get_parts_for_a_re(r1, id, heading, text, results, title)
         get_parts_for_a_re(r2, id, heading, text, results, title)
         get_parts_for_a_re(r3, id, heading, text, results, title)
+        yield from results
         if count % 100 == 0:
-            print(f"Done {count}/{length}..")
-    return results
+            print(f"Done {count}..")
 
 
 
-def main_extract_n1000(es):
-    id_heading_text = get_all_id_heading_text(es)  # TODO aici trebuie sa returneze si titlul, iar urmatoarele functii tb sa stie asta
-    certain_n_1000 = get_sections_with_numbers(id_heading_text)
-    certain_ids = set([id for id, heading, text, title in certain_n_1000])
-    filtered_id_heading_text = [x for x in id_heading_text if x[0] not in certain_ids]
-    remove_irrelevent_4_numbers(filtered_id_heading_text)
+def main_extract_n1000(documents):
+    # a pipeline of generators: candidates are written while the source is read
+    certain_ids = set()
+    filtered_id_heading_text = filter_certain_articles(get_all_id_heading_text(documents), certain_ids)
     with open('potential_n1000.csv', 'w') as f:
         csv_writer = csv.writer(f)
-        for id, heading, text, title in get_parts_of_texts_with_numbers(filtered_id_heading_text):
+        for id, heading, text, title in get_parts_of_texts_with_numbers(remove_irrelevent_4_numbers(filtered_id_heading_text)):
             for t in text:
                 csv_writer.writerow([id, heading, [t], title])
+            f.flush()
 
 specific_id_to_class = {}
 
 
-def main_label_everything(es):
-    id_heading_text = get_all_id_heading_text(es)
-    certain_n_1000 = get_sections_with_numbers(id_heading_text)
-    certain_ids = set([id for id, heading, text in certain_n_1000])
+def main_label_everything(documents):
+    certain_ids = set()
+    filtered_id_heading_text = filter_certain_articles(get_all_id_heading_text(documents), certain_ids)
 
-    filtered_id_heading_text = [x for x in id_heading_text if x[0] not in certain_ids]
-    remove_irrelevent_4_numbers(filtered_id_heading_text)
-    
     n1000_ids = set()
-    n1000_ids.update(certain_ids)
-    count = 0
-    for id, heading, text in get_parts_of_texts_with_numbers(filtered_id_heading_text):
+    for id, heading, text, title in get_parts_of_texts_with_numbers(remove_irrelevent_4_numbers(filtered_id_heading_text)):
         if text:
             n1000_ids.add(id)
+    n1000_ids.update(certain_ids)
 
     with open("ids_n1000.txt", "w") as f:
         for id in n1000_ids:
@@ -337,7 +308,7 @@ def compute_rules_and_t5_predictions():
             y_pred_rules.append((row[0], row[3]))  # (id, titlul-ul of the potential largeN)
             
     print("T5 compute results")
-    y_pred_t5 = eval_articles.evaluate_with_t5(corpus_file, y_pred_rules, largeN_year)
+    y_pred_t5 = eval_articles.evaluate_with_t5(open_source(corpus_file), y_pred_rules, largeN_year)
 
     return y_pred_t5, y_pred_rules
     
@@ -345,15 +316,20 @@ corpus_file = "eric.json"
 largeN_year = 2022 # select the year for which all articles will be verified for potential largeN
 
 if __name__ == '__main__':
-    es = Elasticsearch(
-        hosts=None,
-        http_auth=None,
-        scheme=None,
-        port=None,
-    ) # hidden for security reasons
-    
     largeN_year = int(sys.argv[1])
 
-    main_extract_n1000(es)    # generates potential_n1000.csv  which contains the id, heading and text of the potential largeN articles using heuristics
+    if len(sys.argv) > 2:
+        # a local snapshot of eric-articles (see utils.document_source.write_snapshot): no es needed
+        documents = open_source(sys.argv[2])
+    else:
+        es = Elasticsearch(
+            hosts=None,
+            http_auth=None,
+            scheme=None,
+            port=None,
+        ) # hidden for security reasons
+        documents = ElasticsearchSource(es, 'eric-articles')
+
+    main_extract_n1000(documents)    # generates potential_n1000.csv  which contains the id, heading and text of the potential largeN articles using heuristics
     compute_rules_and_t5_predictions()
 
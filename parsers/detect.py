@@ -0,0 +1,95 @@
+import re
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple, Type
+
+import numpy as np
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LTPage
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+
+from parsers.elsevier import ElsevierParser
+from parsers.frontiers import FrontiersParser
+from parsers.ijcsclParser import IjcsclParser
+from parsers.lak_sigcse import LakSigcseParser
+from parsers.generic import GenericParser
+from parsers.parser import Parser, iter_chars
+from parsers.springer_conf import SpringerConfParser
+
+ParserSpec = Tuple[Type[Parser], Dict[str, Any]]
+
+SUBSET_PREFIX = re.compile(r"^[A-Z]{6}\+")
+
+
+class PageSample:
+    # what the detector looks at on the first page: chars as the interpreter draws
+    # them, without any layout analysis (no lines, no boxes, hence no spaces in text)
+
+    def __init__(self, page: LTPage):
+        self.width = page.width
+        self.height = page.height
+        chars = [char for char in iter_chars(page) if char.get_text().strip()]
+        self.text = "".join(char.get_text() for char in chars).lower()
+        self.fonts = Counter(re.sub(SUBSET_PREFIX, "", char.fontname).lower() for char in chars)
+        sizes = Counter(round(char.size) for char in chars)
+        self.body_size = sizes.most_common(1)[0][0] if sizes else 0
+        body = [char for char in chars if round(char.size) == self.body_size]
+        self.body_x0 = np.array([char.x0 for char in body])
+        self.body_x1 = np.array([char.x1 for char in body])
+
+    def has_font(self, *names: str) -> bool:
+        return any(name in font for font in self.fonts for name in names)
+
+    def body_left(self) -> float:
+        return float(np.percentile(self.body_x0, 5)) if len(self.body_x0) else 0.
+
+    def columns(self, bin_width: int = 4) -> int:
+        # a gutter is a strip in the middle of the body text that (almost) no char covers
+        if len(self.body_x0) < 200:
+            return 1
+        left, right = np.percentile(self.body_x0, 2), np.percentile(self.body_x1, 98)
+        bins = np.arange(left, right, bin_width)
+        if len(bins) < 10:
+            return 1
+        coverage = np.array([np.sum((self.body_x0 < b + bin_width) & (self.body_x1 > b)) for b in bins])
+        middle = coverage[len(bins) // 3: 2 * len(bins) // 3]
+        return 2 if middle.min() < 0.05 * np.median(coverage) else 1
+
+
+def sample_first_page(pdf_file: str) -> PageSample:
+    with open(pdf_file, "rb") as fp:
+        document = PDFDocument(PDFParser(fp))
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=None)
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        for page in PDFPage.create_pages(document):
+            interpreter.process_page(page)
+            return PageSample(device.get_result())
+    return None
+
+
+def detect_layout(sample: PageSample) -> Optional[ParserSpec]:
+    if "frontiersin" in sample.text or sample.has_font("univers"):
+        # the current layout keeps a metadata sidebar left of x=160 on the first page,
+        # in a smaller font than the body text
+        return FrontiersParser, {"old_version": sample.body_left() < 160}
+    if "elsevier" in sample.text or "sciencedirect" in sample.text:
+        return ElsevierParser, {"num_columns": sample.columns()}
+    if "computer-supportedcollaborativelearning" in sample.text:
+        return IjcsclParser, {}
+    if "acmreferenceformat" in sample.text or "permissiontomakedigital" in sample.text \
+            or sample.has_font("libertine", "nimbusromno9l"):
+        return LakSigcseParser, {}
+    if sample.width < 500 or "springer" in sample.text or "lncs" in sample.text:
+        return SpringerConfParser, {}
+    return None
+
+
+def detect_parser(pdf_file: str) -> Optional[ParserSpec]:
+    # publishers without a parser of their own get the self calibrating one
+    sample = sample_first_page(pdf_file)
+    if sample is None:
+        return None
+    return detect_layout(sample) or (GenericParser, {})
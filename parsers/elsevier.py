@@ -1,11 +1,14 @@
-from collections import Counter, deque
+from collections import deque
 import re
 from typing import List
 import numpy as np
-from pdfminer.layout import LTCurve, LTLine, LTChar, LTPage, LTTextLineHorizontal
+from pdfminer.layout import LTCurve, LTLine, LTTextLineHorizontal
 
+from parsers.exclusion import ExclusionIndex
+from parsers.geometry import PageGeometry
+from parsers.page import PageObjects
 from parsers.parser import Parser
-from utils.utils import Heading
+from utils.utils import HeadingIndex
 
 
 class ElsevierParser(Parser):
@@ -32,12 +35,29 @@ class ElsevierParser(Parser):
                 return False
             return 35 < line.x0 < 510
         
-    def check_heading(self, line: LTTextLineHorizontal, heading_list: List[Heading] = None) -> bool:
-        if not re.match(self.NUMBERING, line.get_text()):
+    def limits_mask(self, geometry: PageGeometry, page_index: int = 0, column: int = 0) -> np.ndarray:
+        inside = geometry.y1 <= 450 if page_index == 0 else np.ones(len(geometry), dtype=bool)
+        if self.cols == 2:
+            inside &= (geometry.y0 >= 55) & (geometry.y1 <= 730)
+            if column == 0:
+                return inside & (30 < geometry.x0) & (geometry.x0 < 300)
+            else:
+                return inside & (300 < geometry.x0) & (geometry.x0 < 510)
+        else:
+            inside &= (geometry.y0 >= 55) & (geometry.y1 <= 690)
+            return inside & (35 < geometry.x0) & (geometry.x0 < 510)
+
+    def check_heading(self, line: LTTextLineHorizontal, heading_list: HeadingIndex = None) -> bool:
+        if not re.match(self.NUMBERING, self.get_text(line)):
             return False
         font = self.get_font(line)
         return self.is_bold(line, font) or self.is_italic(line, font)
     
+    def heading_level(self, line: LTTextLineHorizontal) -> int:
+        # check_heading only takes numbered headings: 1. Introduction, 1.1. Participants
+        level = self.numbering_level(line)
+        return 0 if level is None else level
+
     def is_bold(self, line: LTTextLineHorizontal, font: str = None) -> bool:
         if not font:
             font = self.get_font(line)
@@ -48,15 +68,12 @@ class ElsevierParser(Parser):
             font = self.get_font(line)
         return re.search(self.ITALIC, font) != None
 
-    def exclude_tables_and_footnotes(self, lines: List[LTTextLineHorizontal], page: LTPage, column = 0) -> List[LTTextLineHorizontal]:
+    def is_rule(self, obj) -> bool:
+        return isinstance(obj, (LTLine, LTCurve)) and abs(obj.y0 - obj.y1) < 1
+
+    def exclude_tables_and_footnotes(self, lines: List[LTTextLineHorizontal], page: PageObjects, column = 0) -> List[LTTextLineHorizontal]:
         # get all horizontal lines
-        table_lines = [
-            obj 
-            for obj in page 
-            if isinstance(obj, (LTLine, LTCurve)) and 
-                abs(obj.y0 - obj.y1) < 1 and
-                self.check_limits(obj, page.pageid - 1, column)
-        ]
+        table_lines = page.rules[column]
         
         # merge overlapping lines
         hlines = {}
@@ -72,7 +89,7 @@ class ElsevierParser(Parser):
         # hlines = [(y, hlines[y]) for y in sorted(hlines)]
 
         # get table headers
-        headers = [line for line in lines if self.is_bold(line) and line.get_text().startswith("Table")]
+        headers = [line for line in lines if self.is_bold(line) and self.get_text(line).startswith("Table")]
         
 
         tables = {}
@@ -106,15 +123,7 @@ class ElsevierParser(Parser):
                     tables.append((table_lines[-1], found.y1))
                 else:
                     tables.append((table_lines[-1], table_lines[0]))         
-        if len(footnotes) >= 1:
-            min_y = min(footnotes)
-        else:
-            min_y = 60
-        lines = [line for line in lines if line.y0 >= min_y]
-
-
-        return [
-            line
-            for line in lines
-            if all(line.y1 < a or line.y0 > b for a, b in tables)
-        ]
+        index = ExclusionIndex(floor=min(footnotes) if footnotes else 60)
+        for a, b in tables:
+            index.add_band(a, b)
+        return page.geometry.filter(lines, index)
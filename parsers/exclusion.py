@@ -0,0 +1,81 @@
+from typing import List, Tuple
+
+import numpy as np
+
+INF = float("inf")
+# coordinates are clipped to +-LIMIT (bands are infinite), which keeps the x intervals
+# of every segment in a range of their own of the flat search array (see _build)
+LIMIT = 1e6
+SPAN = 4 * LIMIT
+
+
+class ExclusionIndex:
+    # Regions of a page (table spans, figure boxes) whose lines are dropped.
+    # The regions are cut into horizontal segments between their y limits; every
+    # segment keeps the merged x intervals of the regions covering it, so the lines
+    # of a page are checked with binary searches (numpy's searchsorted, all lines at
+    # once) instead of against every region.
+
+    def __init__(self, floor: float = None):
+        self.floor = floor  # lines starting below this y (footnotes) are excluded
+        self.boxes: List[Tuple[float, float, float, float]] = []
+        self._segments = None
+
+    def add_band(self, y0: float, y1: float):
+        self.add_box(-INF, y0, INF, y1)
+
+    def add_box(self, x0: float, y0: float, x1: float, y1: float):
+        self.boxes.append((min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)))
+        self._segments = None
+
+    def _build(self):
+        ys = sorted({y for _, y0, _, y1 in self.boxes for y in (y0, y1)})
+        # closed segments, ordered by both ends: [y0, y0], [y0, y1], [y1, y1], ...
+        bounds = [(ys[0], ys[0])]
+        for a, b in zip(ys, ys[1:]):
+            bounds += [(a, b), (b, b)]
+        lows, highs, starts, ends, offsets = [], [], [], [], [0]
+        for lo, hi in bounds:
+            intervals = sorted((x0, x1) for x0, y0, x1, y1 in self.boxes if y0 <= lo and hi <= y1)
+            if not intervals:
+                continue
+            merged = [list(intervals[0])]
+            for x0, x1 in intervals[1:]:
+                if x0 <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], x1)
+                else:
+                    merged.append([x0, x1])
+            # the ends of segment k are shifted by k * SPAN: one sorted array for all segments
+            shift = len(lows) * SPAN
+            lows.append(lo)
+            highs.append(hi)
+            starts += [a for a, b in merged]
+            ends += [min(b, LIMIT) + shift for a, b in merged]
+            offsets.append(len(ends))
+        self._segments = np.array(lows), np.array(highs), np.array(starts), np.array(ends), np.array(offsets)
+
+    def mask(self, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray) -> np.ndarray:
+        # lines starting below the floor or touching a region
+        excluded = np.zeros(len(x0), dtype=bool)
+        if self.floor is not None:
+            excluded |= y0 < self.floor
+        if not self.boxes:
+            return excluded
+        if self._segments is None:
+            self._build()
+        lows, highs, starts, ends, offsets = self._segments
+        # the segments a line's y range meets, [first, last): usually one or two
+        first = np.searchsorted(highs, y0, side="left")
+        last = np.searchsorted(lows, y1, side="right")
+        x0 = np.clip(x0, -LIMIT, LIMIT)
+        for step in range(int((last - first).max(initial=0))):
+            k = first + step
+            rows = np.flatnonzero((k < last) & ~excluded)
+            if not len(rows):
+                break
+            k = k[rows]
+            # the first interval of segment k ending at or after x0
+            j = np.searchsorted(ends, x0[rows] + k * SPAN, side="left")
+            inside = j < offsets[k + 1]
+            excluded[rows[inside]] = starts[j[inside]] <= x1[rows[inside]]
+        return excluded
@@ -1,10 +1,10 @@
 import re
-from typing import List
 import numpy as np
-from pdfminer.layout import LTLine, LTChar, LTPage, LTTextLineHorizontal
+from pdfminer.layout import LTTextLineHorizontal
 
+from parsers.geometry import PageGeometry
 from parsers.parser import Parser
-from utils.utils import Heading
+from utils.utils import HeadingIndex
 
 
 class FrontiersParser(Parser):
@@ -26,7 +26,16 @@ class FrontiersParser(Parser):
         else:
             return line.x1 > 300
 
-    def check_heading(self, line: LTTextLineHorizontal, heading_list: List[Heading] = None) -> bool:
+    def limits_mask(self, geometry: PageGeometry, page_index: int = 0, column: int = 0) -> np.ndarray:
+        inside = (geometry.y0 >= 60) & (geometry.y1 <= 720)
+        if page_index == 0 and not self.old_version:
+            return inside & (geometry.x0 > 160) if column == 0 else np.zeros(len(geometry), dtype=bool)
+        if column == 0:
+            return inside & (geometry.x0 < 295)
+        else:
+            return inside & (geometry.x1 > 300)
+
+    def check_heading(self, line: LTTextLineHorizontal, heading_list: HeadingIndex = None) -> bool:
         if self.old_version:
             font = self.get_font(line)
             return self.is_bold(line, font)
@@ -52,40 +61,7 @@ class FrontiersParser(Parser):
                 return 0
         else:
             font = self.get_font(line)
-            if line.get_text().isupper() or font.endswith("-bd"):
+            if self.get_text(line).isupper() or font.endswith("-bd"):
                 return 0
             else:
                 return 1
-
-    def exclude_tables_and_footnotes(self, lines: List[LTTextLineHorizontal], page: LTPage, column = 0) -> List[LTTextLineHorizontal]:
-        table_lines = [
-            obj 
-            for obj in page 
-            if isinstance(obj, LTLine) and 
-                round(obj.y0 * 10) == round(obj.y1 * 10) and
-                self.check_limits(obj, page.pageid - 1, column)
-        ]
-        tables = {}
-        for line in table_lines:
-            limits = (round(line.x0 * 10), round(line.x1 * 10))
-            if limits not in tables:
-                tables[limits] = []
-            tables[limits].append(line)
-        footnotes = [
-            table_lines[0].y0 
-            for limits, table_lines in tables.items() 
-            if len(table_lines) == 1 and table_lines[0].x1 - table_lines[0].x0 > 200]
-        if len(footnotes) >= 1:
-            min_y = min(footnotes)
-        else:
-            min_y = 60
-        lines = [line for line in lines if line.y0 >= min_y]
-        limits = [
-            (min(table_lines, key=lambda x: x.y0).y0, max(table_lines, key=lambda x: x.y0).y0)
-            for limits, table_lines in tables.items() if len(table_lines) > 1
-        ]
-        return [
-            line
-            for line in lines
-            if all(line.y1 < a or line.y0 > b for a, b in limits)
-        ]
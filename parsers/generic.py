@@ -0,0 +1,163 @@
+import re
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LTTextLineHorizontal
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+
+from parsers.geometry import PageGeometry
+from parsers.parser import Parser, iter_chars
+from parsers.reading_order import find_gutters
+from utils.utils import HeadingIndex
+
+NUMBERING = re.compile(r"^\s*((\d+|[IVX]+)(\.\d+)*)\.?\s+\S")
+DIGITS = re.compile(r"\d+")
+
+
+class GenericParser(Parser):
+    # For publishers without a parser of their own: before reading a file, one pass
+    # over the chars of its first pages (no layout analysis) learns the body font size,
+    # the heading sizes, the text block, the column gutters and the running headers
+    # and footers, which then play the part of the hard-coded limits of other parsers.
+
+    BOLD = re.compile(r"bold|black|heavy|semibold|demi|medi|-bd$|\.b$|cmbx")
+    MAX_HEADING_WORDS = 15
+
+    def __init__(self, max_pages: int = 12):
+        super().__init__(1, False)
+        self.max_pages = max_pages
+        self.reset()
+
+    def reset(self):
+        self.cols = 1
+        self.body_size = 0.
+        self.heading_sizes: List[float] = []
+        self.left, self.right = 0., float("inf")
+        self.bottom, self.top = 0., float("inf")
+        self.gutters: List[float] = []
+
+    def prepare(self, pdf_file: str):
+        pages = []
+        with open(pdf_file, "rb") as fp:
+            document = PDFDocument(PDFParser(fp), caching=False)
+            rsrcmgr = PDFResourceManager(caching=True)
+            device = PDFPageAggregator(rsrcmgr, laparams=None)
+            interpreter = PDFPageInterpreter(rsrcmgr, device)
+            for i, page in enumerate(PDFPage.create_pages(document)):
+                if i == self.max_pages:
+                    break
+                interpreter.process_page(page)
+                layout = device.get_result()
+                chars = [char for char in iter_chars(layout) if char.get_text().strip() and char.upright]
+                pages.append((layout.height, chars))
+        self.calibrate(pages)
+
+    def calibrate(self, pages: List):
+        self.reset()
+        sizes = Counter()
+        later_sizes = set()  # sizes also used after the first page (not the title)
+        for i, (_, chars) in enumerate(pages):
+            for char in chars:
+                size = round(char.size * 2) / 2
+                sizes[size] += 1
+                if i > 0 or len(pages) == 1:
+                    later_sizes.add(size)
+        if not sizes:
+            return
+        self.body_size = sizes.most_common(1)[0][0]
+        self.heading_sizes = sorted(
+            (size for size, count in sizes.items()
+             if size > self.body_size + 0.5 and count >= 3 and size in later_sizes),
+            reverse=True)[:3]
+
+        body = [[char for char in chars if abs(char.size - self.body_size) <= 0.5] for _, chars in pages]
+        x0 = np.array([char.x0 for chars in body for char in chars])
+        x1 = np.array([char.x1 for chars in body for char in chars])
+        if len(x0):
+            self.left, self.right = float(np.percentile(x0, 1)), float(np.percentile(x1, 99))
+
+        # the gutters of the most common column layout, leaving out the first page (title, abstract)
+        layouts = [find_gutters(np.array([c.x0 for c in chars]), np.array([c.x1 for c in chars]), min_lines=100)
+                   for chars in (body[1:] or body)]
+        count = Counter(len(gutters) for gutters in layouts).most_common(1)[0][0]
+        self.gutters = [float(np.median(column)) for column in
+                        zip(*(gutters for gutters in layouts if len(gutters) == count))]
+        self.cols = len(self.gutters) + 1
+        self.calibrate_running_lines(pages)
+
+    def calibrate_running_lines(self, pages: List):
+        # rows of text near the top or bottom of the page that come back on many pages
+        # (page numbers aside) are running headers and footers
+        rows: Dict[tuple, list] = {}
+        for i, (height, chars) in enumerate(pages):
+            page_rows: Dict[int, list] = {}
+            for char in chars:
+                page_rows.setdefault(round(char.y0), []).append(char)
+            for y, row in page_rows.items():
+                if height * 0.12 < y < height * 0.88:
+                    continue
+                row.sort(key=lambda char: char.x0)
+                text = DIGITS.sub("#", "".join(char.get_text() for char in row))
+                rows.setdefault((y > height / 2, text), []).append(
+                    (i, min(char.y0 for char in row), max(char.y1 for char in row)))
+        min_pages = max(2, 0.4 * len(pages))
+        for (top, _), occurrences in rows.items():
+            if len({i for i, _, _ in occurrences}) < min_pages:
+                continue
+            if top:
+                self.top = min(self.top, min(y0 for _, y0, _ in occurrences) - 1)
+            else:
+                self.bottom = max(self.bottom, max(y1 for _, _, y1 in occurrences) + 1)
+
+    def check_limits(self, line: LTTextLineHorizontal, page_index: int = 0, column: int = 0) -> bool:
+        if line.y0 < self.bottom or line.y1 > self.top:
+            return False
+        if line.x1 <= self.left or line.x0 >= self.right:  # margin notes, line numbers
+            return False
+        # a line that crosses a gutter (title, wide caption) belongs to the column it starts in
+        low = self.gutters[column - 1] if column > 0 else -float("inf")
+        high = self.gutters[column] if column < len(self.gutters) else float("inf")
+        return low <= line.x0 < high
+
+    def limits_mask(self, geometry: PageGeometry, page_index: int = 0, column: int = 0) -> np.ndarray:
+        inside = (geometry.y0 >= self.bottom) & (geometry.y1 <= self.top)
+        inside &= (geometry.x1 > self.left) & (geometry.x0 < self.right)
+        if column > 0:
+            inside &= geometry.x0 >= self.gutters[column - 1]
+        if column < len(self.gutters):
+            inside &= geometry.x0 < self.gutters[column]
+        return inside
+
+    def is_bold(self, line: LTTextLineHorizontal, font: str = None) -> bool:
+        if not font:
+            font = self.get_font(line)
+        return re.search(self.BOLD, font) is not None
+
+    def check_heading(self, line: LTTextLineHorizontal, heading_list: HeadingIndex = None) -> bool:
+        features = self.line_features(line)
+        text = features.text.strip()
+        if not text or len(text.split()) > self.MAX_HEADING_WORDS:
+            return False
+        if heading_list:
+            return features.size >= self.body_size - 0.5 and self.check_heading_list(line, heading_list) is not None
+        if any(abs(features.size - size) <= 0.5 for size in self.heading_sizes):
+            return True
+        if features.num_fonts == 1 and self.is_bold(line, features.font):
+            return re.match(NUMBERING, text) is not None or text.isupper() \
+                or (len(text.split()) <= 8 and not text.endswith("."))
+        return False
+
+    def heading_level(self, line: LTTextLineHorizontal) -> int:
+        features = self.line_features(line)
+        match = re.match(NUMBERING, features.text)
+        if match:
+            return match.group(1).count(".")
+        for level, size in enumerate(self.heading_sizes):
+            if features.size >= size - 0.5:
+                return level
+        return len(self.heading_sizes)
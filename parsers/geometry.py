@@ -0,0 +1,61 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from parsers.record import LineRecord
+
+
+def mode(values: np.ndarray):
+    # most common value, ties going to the one seen first (as Counter.most_common)
+    uniques, first, counts = np.unique(values, return_index=True, return_counts=True)
+    best = counts == counts.max()
+    return uniques[best][np.argmin(first[best])]
+
+
+class PageGeometry:
+    # Structure of arrays over the text lines of a page, built once when the page is
+    # classified: limit checks, margins and exclusions are then boolean masks over
+    # the rows instead of attribute lookups on every pdfminer object.
+
+    def __init__(self, lines: List[LineRecord], sizes: List[float], bold: List[bool], cols: int):
+        self.lines = lines
+        self.x0 = np.array([line.x0 for line in lines], dtype=float)
+        self.y0 = np.array([line.y0 for line in lines], dtype=float)
+        self.x1 = np.array([line.x1 for line in lines], dtype=float)
+        self.y1 = np.array([line.y1 for line in lines], dtype=float)
+        self.size = np.array(sizes, dtype=float)
+        self.bold = np.array(bold, dtype=bool)
+        # a line may belong to both columns (e.g. a full width line), hence one mask per column
+        self.column = np.zeros((cols, len(lines)), dtype=bool)
+        self._rows = {id(line): row for row, line in enumerate(lines)}
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getstate__(self):
+        # row lookup is by object id, which does not survive pickling (pages laid out in workers)
+        state = self.__dict__.copy()
+        del state["_rows"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._rows = {id(line): row for row, line in enumerate(self.lines)}
+
+    @property
+    def height(self) -> np.ndarray:
+        return self.y1 - self.y0
+
+    def rows(self, lines: List[LineRecord]) -> np.ndarray:
+        return np.array([self._rows[id(line)] for line in lines], dtype=int)
+
+    def filter(self, lines: List[LineRecord], index) -> List[LineRecord]:
+        # lines (in their order) that the ExclusionIndex does not exclude
+        rows = self.rows(lines)
+        excluded = index.mask(self.x0[rows], self.y0[rows], self.x1[rows], self.y1[rows])
+        return [line for line, drop in zip(lines, excluded) if not drop]
+
+    def page_limits(self, lines: List[LineRecord]) -> Tuple[int, int]:
+        # the most common left and right edges of the lines, to the nearest 10pt
+        rows = self.rows(lines)
+        return int(mode(np.round(self.x0[rows] / 10))) * 10, int(mode(np.round(self.x1[rows] / 10))) * 10
@@ -1,11 +1,10 @@
-from collections import Counter
-
-from typing import List
 import numpy as np
-from pdfminer.layout import LTLine, LTChar, LTPage, LTTextLineHorizontal
+from pdfminer.layout import LTTextLineHorizontal
 
+from parsers.geometry import PageGeometry
 from parsers.parser import Parser
-from utils.utils import Heading
+from parsers.record import LineRecord
+from utils.utils import HeadingIndex
 
 
 class LakSigcseParser(Parser):
@@ -23,9 +22,8 @@ class LakSigcseParser(Parser):
             if column == 1 and line.x0 < 300:
                 return False
 
-        # check font size
-        avg_size = self.get_size(line)
-        if avg_size < 8:
+        # check font size (rules and figures have none)
+        if isinstance(line, LineRecord) and self.get_size(line) < 8:
             return False
 
         if column == 0:
@@ -33,9 +31,19 @@ class LakSigcseParser(Parser):
         else:
             return line.x1 > 300
 
-    def check_heading(self, line: LTTextLineHorizontal, heading_list: List[Heading] = None) -> bool:
-        fonts = Counter([char.fontname for char in line if isinstance(char, LTChar)])
-        font = fonts.most_common()[0][0].lower()
+    def limits_mask(self, geometry: PageGeometry, page_index: int = 0, column: int = 0) -> np.ndarray:
+        inside = (geometry.y0 >= 60) & (geometry.y1 <= 720)
+        if page_index == 0:
+            inside &= geometry.x1 <= 300 if column == 0 else geometry.x0 >= 300
+        # lines without a size (no chars) are kept, as in check_limits
+        inside &= ~(geometry.size < 8)
+        if column == 0:
+            return inside & (geometry.x0 < 295)
+        else:
+            return inside & (geometry.x1 > 300)
+
+    def check_heading(self, line: LTTextLineHorizontal, heading_list: HeadingIndex = None) -> bool:
+        font = self.get_font(line)
         potential_subheading = 'cmbx' in font or "bold" in font or ".b" in font \
                                or 'nimbusromno9l-medi' in font or 'libertinetb' in font or \
                                'libertineb' in font
@@ -49,39 +57,13 @@ class LakSigcseParser(Parser):
             potential_subheading = potential_subheading and True
 
         if potential_subheading:
-            if "." in line.get_text() and avg_size > 10:
+            if "." in self.get_text(line) and avg_size > 10:
                 return True
         return False
 
-    def exclude_tables_and_footnotes(self, lines: List[LTTextLineHorizontal], page: LTPage, column=0) -> List[LTTextLineHorizontal]:
-        table_lines = [
-            obj
-            for obj in page
-            if isinstance(obj, LTLine) and
-               round(obj.y0 * 10) == round(obj.y1 * 10) and
-               self.check_limits(obj, page.pageid - 1, column)
-        ]
-        tables = {}
-        for line in table_lines:
-            limits = (round(line.x0 * 10), round(line.x1 * 10))
-            if limits not in tables:
-                tables[limits] = []
-            tables[limits].append(line)
-        footnotes = [
-            table_lines[0].y0
-            for limits, table_lines in tables.items()
-            if len(table_lines) == 1 and table_lines[0].x1 - table_lines[0].x0 > 200]
-        if len(footnotes) >= 1:
-            min_y = min(footnotes)
-        else:
-            min_y = 60
-        lines = [line for line in lines if line.y0 >= min_y]
-        limits = [
-            (min(table_lines, key=lambda x: x.y0).y0, max(table_lines, key=lambda x: x.y0).y0)
-            for limits, table_lines in tables.items() if len(table_lines) > 1
-        ]
-        return [
-            line
-            for line in lines
-            if all(line.y1 < a or line.y0 > b for a, b in limits)
-        ]
+    def heading_level(self, line: LTTextLineHorizontal) -> int:
+        level = self.numbering_level(line)
+        if level is not None:
+            return level
+        # unnumbered: sections are set in capitals (ACM), subsections are not
+        return 0 if self.get_text(line).isupper() else 1
@@ -0,0 +1,143 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+from typing import Callable, Collection, IO, Iterator, List, Tuple
+
+import numpy as np
+from pdfminer.layout import (LAParams, LTContainer, LTCurve, LTFigure, LTLine, LTPage, LTRect, LTAnno,
+                             LTTextBoxHorizontal, LTTextLineHorizontal)
+
+from parsers.parser import LineFeatures, attach_features, line_features
+from utils.utils import Heading, file_sha256
+
+IDENTITY = (1, 0, 0, 1, 0, 0)
+FORMAT_VERSION = 2
+
+
+def dump_headings(headings: List[Heading]) -> list:
+    return [[h.title, h.parent_index, h.index, dump_headings(h.subheadings)] for h in headings]
+
+
+def load_headings(data: list) -> List[Heading]:
+    return [Heading(title, parent_index, index, load_headings(subheadings))
+            for title, parent_index, index, subheadings in data]
+
+
+def dump_page(page: LTPage) -> dict:
+    objs = []
+    for obj in page:
+        if isinstance(obj, LTTextBoxHorizontal):
+            lines = []
+            for line in obj:
+                if not isinstance(line, LTTextLineHorizontal):
+                    continue
+                features = line_features(line)
+                color = None if features.color is None else np.asarray(features.color).tolist()
+                lines.append([line.x0, line.y0, line.x1, line.y1, features.text, features.font,
+                              features.num_fonts, features.size, features.upright, color])
+            objs.append(["text", lines])
+        elif isinstance(obj, LTLine):
+            objs.append(["line", obj.linewidth, obj.pts])
+        elif isinstance(obj, LTRect):
+            objs.append(["rect", obj.linewidth, obj.bbox])
+        elif isinstance(obj, LTCurve):
+            objs.append(["curve", obj.linewidth, obj.pts])
+        elif isinstance(obj, LTFigure):
+            objs.append(["figure", obj.name, (obj.x0, obj.y0, obj.width, obj.height)])
+    return {"pageid": page.pageid, "bbox": page.bbox, "objs": objs}
+
+
+def load_page(data: dict) -> LTPage:
+    # rebuilds the pdfminer objects without their chars: text lines carry their
+    # text and precomputed features, which is all the parsers read
+    page = LTPage(data["pageid"], data["bbox"])
+    for kind, *args in data["objs"]:
+        if kind == "text":
+            box = LTTextBoxHorizontal()
+            for x0, y0, x1, y1, text, font, num_fonts, size, upright, color in args[0]:
+                line = LTTextLineHorizontal(0)
+                line.set_bbox((x0, y0, x1, y1))
+                LTContainer.add(line, LTAnno(text))
+                attach_features(line, LineFeatures(
+                    text, font, num_fonts, size, upright, None if color is None else np.asarray(color)))
+                box.add(line)
+            page.add(box)
+        elif kind == "line":
+            page.add(LTLine(args[0], *map(tuple, args[1])))
+        elif kind == "rect":
+            page.add(LTRect(args[0], args[1]))
+        elif kind == "curve":
+            page.add(LTCurve(args[0], [tuple(p) for p in args[1]]))
+        elif kind == "figure":
+            page.add(LTFigure(args[0], args[1], IDENTITY))
+    return page
+
+
+class LayoutCache:
+    # On-disk pdfminer layouts: a gzipped json line with the outlines followed by
+    # one line per page, keyed by the sha256 of the pdf and the layout parameters.
+    # Changing a parser threshold then only replays the cached pages instead of
+    # running layout analysis again.
+
+    def __init__(self, folder: str, laparams: LAParams = None):
+        self.folder = folder
+        self.laparams = laparams or LAParams()
+        params = json.dumps([FORMAT_VERSION, vars(self.laparams)], sort_keys=True, default=str)
+        self.params_key = hashlib.sha256(params.encode()).hexdigest()[:16]
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, pdf_file: str) -> str:
+        return os.path.join(self.folder, f"{file_sha256(pdf_file)}-{self.params_key}.jsonl.gz")
+
+    def open_layout(self, pdf_file: str,
+                    layout: Callable[[str, LAParams, Collection[int]], Tuple[List[Heading], Iterator[LTPage]]]
+                    ) -> Tuple[List[Heading], Iterator[LTPage]]:
+        path = self.path(pdf_file)
+        if os.path.exists(path):
+            f = gzip.open(path, "rt", encoding="utf-8")
+            headings = load_headings(json.loads(f.readline())["outlines"])
+            return headings, self._replay(f, pdf_file, headings, layout, path)
+        headings, pages = layout(pdf_file, self.laparams)
+        return headings, self._write_through(path, headings, pages)
+
+    def _replay(self, f: IO[str], pdf_file: str, headings: List[Heading], layout: Callable, path: str
+                ) -> Iterator[LTPage]:
+        rows = []
+        with f:
+            for row in f:
+                data = json.loads(row)
+                if "partial" in data:
+                    break
+                rows.append(row)
+                yield load_page(data)
+            else:
+                return
+        # a partial entry ran out: the following pages are laid out now and the entry completed
+        _, pages = layout(pdf_file, self.laparams, range(len(rows), sys.maxsize))
+        yield from self._write_through(path, headings, pages, rows)
+
+    def _write_through(self, path: str, headings: List[Heading], pages: Iterator[LTPage],
+                       rows: List[str] = ()) -> Iterator[LTPage]:
+        # The entry only becomes visible once the pages were written. When the reader stops
+        # early (stop_at_terminal), the pages read so far are kept as a partial entry, whose
+        # last line says so: replaying it lays out the rest only if a reader gets that far.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.write(json.dumps({"outlines": dump_headings(headings)}) + "\n")
+                f.writelines(rows)
+                count = len(rows)
+                try:
+                    for page in pages:
+                        f.write(json.dumps(dump_page(page)) + "\n")
+                        count += 1
+                        yield page
+                except GeneratorExit:
+                    pages.close()
+                    f.write(json.dumps({"partial": count}) + "\n")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
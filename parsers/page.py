@@ -0,0 +1,17 @@
+from typing import List
+
+from pdfminer.layout import LTComponent
+
+from parsers.geometry import PageGeometry
+from parsers.record import LineRecord
+
+
+class PageObjects:
+    # the objects of a page the parsers care about, sorted into typed buckets per column
+
+    def __init__(self, index: int, cols: int):
+        self.index = index
+        self.lines: List[List[LineRecord]] = [[] for _ in range(cols)]
+        self.rules: List[List[LTComponent]] = [[] for _ in range(cols)]
+        self.figures: List[List[LTComponent]] = [[] for _ in range(cols)]
+        self.geometry: PageGeometry = None
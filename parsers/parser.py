@@ -1,14 +1,88 @@
 import abc
+import re
 from collections import Counter
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import numpy as np
-from pdfminer.layout import LTFigure, LTLine, LTChar, LTPage, LTTextLineHorizontal
+from pdfminer.layout import LTComponent, LTContainer, LTFigure, LTLine, LTChar, LTPage, LTTextBoxHorizontal, LTTextLineHorizontal
 
-from utils.utils import Heading
+from parsers.exclusion import ExclusionIndex
+from parsers.geometry import PageGeometry
+from parsers.page import PageObjects
+from parsers.reading_order import reading_order, resolve_columns
+from parsers.record import LineRecord
+from utils.utils import Heading, HeadingIndex
+
+
+class LineFeatures:
+    # everything the parsers look at in a line, computed in a single walk over its chars
+    __slots__ = ("text", "font", "num_fonts", "size", "upright", "color")
+
+    def __init__(self, text: str, font: str, num_fonts: int, size: float, upright: float, color: np.ndarray):
+        self.text = text
+        self.font = font
+        self.num_fonts = num_fonts
+        self.size = size
+        self.upright = upright
+        self.color = color
+
+    @classmethod
+    def from_line(cls, line: LTTextLineHorizontal) -> "LineFeatures":
+        fonts = Counter()
+        heights = []
+        colors = []
+        upright = 0
+        for char in line:
+            if isinstance(char, LTChar):
+                fonts[char.fontname] += 1
+                heights.append(char.height)
+                colors.append(char.graphicstate.ncolor or 0.)
+                upright += int(char.upright)
+        try:
+            color = np.mean(colors, axis=0) if colors else None
+        except ValueError:  # chars with different colour spaces
+            color = None
+        return cls(
+            line.get_text(),
+            fonts.most_common(1)[0][0].lower() if fonts else "",
+            len(fonts),
+            sum(heights) / len(heights) if heights else float("nan"),
+            upright / len(heights) if heights else 0.,
+            color)
+
+
+def line_features(line: LTTextLineHorizontal) -> LineFeatures:
+    if isinstance(line, LineRecord):
+        return line
+    features = getattr(line, "_features", None)
+    if features is None:
+        features = line._features = LineFeatures.from_line(line)
+    return features
+
+
+def attach_features(line: LTTextLineHorizontal, features: LineFeatures):
+    line._features = features
+
+
+def iter_chars(container: LTContainer):
+    for obj in container:
+        if isinstance(obj, LTChar):
+            yield obj
+        elif isinstance(obj, LTContainer):
+            yield from iter_chars(obj)
 
 
 class Parser:
 
+    # a single rule at least this wide separates the footnotes from the text
+    FOOTNOTE_WIDTH = 200
+    # level 0 headings after which extraction can stop (see extract_content's stop_at_terminal)
+    TERMINAL_HEADINGS = {
+        "references", "reference", "bibliography", "acknowledgements", "acknowledgments",
+        "acknowledgement", "acknowledgment",
+    }
+    # "2 Method", "2. Method", "2.1 Participants": the depth of the number is the heading level
+    SECTION_NUMBER = re.compile(r"^\s*(\d+(\.\d+)*)\.?\s")
+
     def __init__(self, cols: int, is_uppercase_title=True):
         self.cols = cols
         self.is_uppercasee_title = is_uppercase_title
@@ -17,55 +91,121 @@ class Parser:
     def check_limits(self, line: LTTextLineHorizontal, page_index: int = 0, column: int = 0) -> bool:
         pass
 
+    def limits_mask(self, geometry: PageGeometry, page_index: int = 0, column: int = 0) -> np.ndarray:
+        # check_limits over all the text lines of a page; parsers override it with array expressions
+        return np.array([self.check_limits(line, page_index, column) for line in geometry.lines], dtype=bool)
+
     @abc.abstractmethod
-    def check_heading(self, line: LTTextLineHorizontal, heading_list: List[Heading] = None) -> bool:
+    def check_heading(self, line: LTTextLineHorizontal, heading_list: HeadingIndex = None) -> bool:
         pass
 
+    def prepare(self, pdf_file: str):
+        # called by extract_content before the pages of a file are read, for parsers
+        # that adapt to the document
+        pass
+
+    def line_features(self, line: LTTextLineHorizontal) -> LineFeatures:
+        return line_features(line)
+
     def is_horizontal(self, line: LTTextLineHorizontal) -> bool:
-        chars = [char for char in line if isinstance(char, LTChar)]
-        return sum(int(char.upright) for char in chars) / len(chars) >= 0.5
+        return self.line_features(line).upright >= 0.5
 
     def check_page(self, page: LTPage) -> bool:
         return page.width < page.height
+
+    def classify_page(self, page: LTPage, page_index: int) -> PageObjects:
+        # a single walk over the page; columns and filters then only read their own bucket,
+        # with the lines already in reading order. Nothing refers to the layout tree afterwards:
+        # lines become records, rules and figures bare boxes
+        result = PageObjects(page_index, self.cols)
+        columns = range(self.cols)
+        lines = []
+        for obj in page:
+            if isinstance(obj, LTTextBoxHorizontal):
+                lines.extend(LineRecord.from_line(line, self.line_features(line))
+                             for line in obj if self.is_horizontal(line))
+            elif self.is_rule(obj):
+                for col in columns:
+                    if self.check_limits(obj, page_index, col):
+                        result.rules[col].append(LTComponent(obj.bbox))
+            elif isinstance(obj, LTFigure):
+                for col in columns:
+                    if self.check_limits(obj, page_index, col):
+                        result.figures[col].append(LTComponent(obj.bbox))
+        geometry = result.geometry = self.page_geometry(lines)
+        for col in columns:
+            geometry.column[col] = self.limits_mask(geometry, page_index, col)
+        resolve_columns(geometry, self.cols)
+        # the page is put in reading order once, every column takes its lines in that order
+        order = reading_order(geometry)
+        for col in columns:
+            result.lines[col] = [geometry.lines[row] for row in order[geometry.column[col][order]]]
+        return result
+
+    def page_geometry(self, lines: List[LineRecord]) -> PageGeometry:
+        return PageGeometry(lines, [self.get_size(line) for line in lines],
+                            [self.is_bold(line) for line in lines], self.cols)
     
-    def exclude_tables_and_footnotes(self, lines: List[LTTextLineHorizontal], page: LTPage, column: int) -> List[LTTextLineHorizontal]:
-        return lines
-
-    def exclude_shapes(self, lines: List[LTTextLineHorizontal], page: LTPage, column: int) -> List[LTTextLineHorizontal]:
-        figures = [
-            obj 
-            for obj in page 
-            if isinstance(obj, LTFigure) and self.check_limits(obj, page.pageid - 1, column)
-        ]
-        return [
-            line
-            for line in lines
-            if all(line.y0 > fig.y1 or line.y1 < fig.y0 or line.x0 > fig.x1 or line.x1 < fig.x0 for fig in figures)
-        ]
+    def is_rule(self, obj) -> bool:
+        return isinstance(obj, LTLine) and round(obj.y0 * 10) == round(obj.y1 * 10)
+
+    def exclude_tables_and_footnotes(self, lines: List[LTTextLineHorizontal], page: PageObjects, column: int) -> List[LTTextLineHorizontal]:
+        table_lines = page.rules[column]
+        tables = {}
+        for line in table_lines:
+            limits = (round(line.x0 * 10), round(line.x1 * 10))
+            if limits not in tables:
+                tables[limits] = []
+            tables[limits].append(line)
+        footnotes = [
+            table_lines[0].y0
+            for limits, table_lines in tables.items()
+            if len(table_lines) == 1 and table_lines[0].x1 - table_lines[0].x0 > self.FOOTNOTE_WIDTH]
+        index = ExclusionIndex(floor=min(footnotes) if footnotes else 60)
+        for limits, table_lines in tables.items():
+            if len(table_lines) > 1:
+                index.add_band(min(line.y0 for line in table_lines), max(line.y0 for line in table_lines))
+        return page.geometry.filter(lines, index)
+
+    def exclude_shapes(self, lines: List[LTTextLineHorizontal], page: PageObjects, column: int) -> List[LTTextLineHorizontal]:
+        index = ExclusionIndex()
+        for fig in page.figures[column]:
+            index.add_box(fig.x0, fig.y0, fig.x1, fig.y1)
+        return page.geometry.filter(lines, index)
         
     def get_size(self, line: LTTextLineHorizontal) -> float:
-        return np.mean([char.height for char in line if isinstance(char, LTChar)])
+        return self.line_features(line).size
     
     def get_font(self, line: LTTextLineHorizontal) -> str:
-        return Counter([char.fontname for char in line if isinstance(char, LTChar)]).most_common(1)[0][0].lower()
+        return self.line_features(line).font
+
+    def get_text(self, line: LTTextLineHorizontal) -> str:
+        return self.line_features(line).text
+
+    def is_bold(self, line: LTTextLineHorizontal, font: str = None) -> bool:
+        if not font:
+            font = self.get_font(line)
+        return "bold" in font
     
     def greyscale(self, line: LTTextLineHorizontal) -> bool:
-        colors = np.mean([char.graphicstate.ncolor or 0. for char in line if isinstance(char, LTChar)], axis=0)
-        if colors.shape:
+        colors = self.line_features(line).color
+        if colors is not None and np.ndim(colors):
             return sum(colors[:2]) < 0.1
         return True
 
+    def is_terminal_heading(self, line: LTTextLineHorizontal) -> bool:
+        return re.sub(r"[^a-z]", "", self.get_text(line).lower()) in self.TERMINAL_HEADINGS
+
     @abc.abstractmethod
     def heading_level(self, line: LTTextLineHorizontal) -> int:  
         pass
 
-    def check_heading_list(self, line: LTTextLineHorizontal, heading_list: List[Heading]) -> Heading:
-        line = line.get_text()
+    def numbering_level(self, line: LTTextLineHorizontal) -> Optional[int]:
+        # the level of a numbered heading, None for a heading without a number
+        match = re.match(self.SECTION_NUMBER, self.get_text(line))
+        return match.group(1).count(".") if match else None
+
+    def check_heading_list(self, line: LTTextLineHorizontal, heading_list: HeadingIndex) -> Heading:
         if heading_list:
-            for heading in heading_list:
-                if line.get_text() in heading.title:
-                    return heading
-                for subheading in heading.subheadings:
-                    if line.get_text() in subheading.title:
-                        return heading
+            return heading_list.find(self.get_text(line))
         return None
@@ -0,0 +1,77 @@
+from typing import List
+
+import numpy as np
+
+from parsers.geometry import PageGeometry
+
+# lines whose bottoms are this close (in pt) are read as one row, left to right
+ROW_TOLERANCE = 2
+
+
+def find_gutters(x0: np.ndarray, x1: np.ndarray, bin_width: float = 2, min_gap: float = 6,
+                 min_lines: int = 10) -> List[float]:
+    # A gutter is a vertical strip that no line covers, with a good share of the lines
+    # entirely on each side of it. Lines as wide as most of the text block (titles,
+    # full width captions, single column paragraphs) are left out of the histogram.
+    if len(x0) < min_lines:
+        return []
+    left, right = x0.min(), x1.max()
+    width = right - left
+    narrow = (x1 - x0) < 0.6 * width
+    x0, x1 = x0[narrow], x1[narrow]
+    if len(x0) < min_lines:
+        return []
+    edges = np.arange(left, right + bin_width, bin_width)
+    coverage = np.zeros(len(edges) + 1, dtype=int)
+    np.add.at(coverage, np.searchsorted(edges, x0, "right") - 1, 1)
+    np.add.at(coverage, np.searchsorted(edges, x1, "left"), -1)
+    empty = np.cumsum(coverage)[:len(edges) - 1] == 0
+    # runs of empty bins, as [start, end) bin indices
+    changes = np.flatnonzero(np.diff(np.concatenate(([0], empty.astype(int), [0]))))
+    gutters = []
+    min_side = max(min_lines // 2, 0.2 * len(x0))
+    for start, end in zip(changes[::2], changes[1::2]):
+        a, b = edges[start], edges[end]
+        if b - a < min_gap or a < left + 0.2 * width or b > right - 0.2 * width:
+            continue
+        if np.sum(x1 <= a) >= min_side and np.sum(x0 >= b) >= min_side:
+            gutters.append(float(a + b) / 2)
+    return gutters
+
+
+def detect_columns(geometry: PageGeometry, gutters: List[float]) -> np.ndarray:
+    # column index of every line, -1 for lines crossing a gutter
+    column = np.searchsorted(np.array(gutters), geometry.x0)
+    for gutter in gutters:
+        column[(geometry.x0 < gutter) & (geometry.x1 > gutter)] = -1
+    return column
+
+
+def resolve_columns(geometry: PageGeometry, cols: int):
+    # The parser limits carry a hard-coded gutter, which is off for some layouts, and
+    # they may put a line in several columns (they overlap around the gutter). When the
+    # gutters found on the page agree with the number of columns, every line the parser
+    # keeps goes to the detected column instead, unless it crosses a gutter.
+    if cols < 2:
+        return
+    gutters = find_gutters(geometry.x0, geometry.x1)
+    if len(gutters) != cols - 1:
+        return
+    detected = detect_columns(geometry, gutters)
+    resolved = geometry.column.any(axis=0) & (detected >= 0)
+    geometry.column[:, resolved] = detected[resolved] == np.arange(cols)[:, None]
+
+
+def reading_order(geometry: PageGeometry, tolerance: float = ROW_TOLERANCE) -> np.ndarray:
+    # rows sorted top to bottom, then left to right within a row. Rows are swept from
+    # the top, a line starts a new row once it is `tolerance` below the first line of the
+    # current one, so (unlike pairwise tolerance comparisons) the order is well defined.
+    order = np.argsort(-geometry.y0, kind="stable")
+    band = np.zeros(len(order), dtype=int)
+    current, anchor = 0, None
+    for k, y in enumerate(geometry.y0[order]):
+        if anchor is None or anchor - y >= tolerance:
+            current += 1
+            anchor = y
+        band[k] = current
+    return order[np.lexsort((geometry.x0[order], band))]
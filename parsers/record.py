@@ -0,0 +1,44 @@
+from typing import NamedTuple, Tuple, Union
+
+import numpy as np
+from pdfminer.layout import LTTextLineHorizontal
+
+
+class LineRecord(NamedTuple):
+    # What is kept of a pdfminer text line once its page is classified: its text,
+    # box and font features, but none of its chars or parent boxes, so the layout
+    # tree of the page can be freed right away. Reads like the line for the parsers
+    # (x0, y1, height, get_text(), ...) and is its own set of line features.
+    text: str
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    font: str
+    num_fonts: int
+    size: float
+    upright: float
+    color: Union[float, Tuple[float, ...], None]
+
+    @classmethod
+    def from_line(cls, line: LTTextLineHorizontal, features) -> "LineRecord":
+        color = features.color
+        if color is not None:
+            color = tuple(np.asarray(color, dtype=float).tolist()) if np.ndim(color) else float(color)
+        return cls(features.text, line.x0, line.y0, line.x1, line.y1, features.font, features.num_fonts,
+                   features.size, features.upright, color)
+
+    @property
+    def bbox(self) -> Tuple[float, float, float, float]:
+        return self.x0, self.y0, self.x1, self.y1
+
+    @property
+    def width(self) -> float:
+        return self.x1 - self.x0
+
+    @property
+    def height(self) -> float:
+        return self.y1 - self.y0
+
+    def get_text(self) -> str:
+        return self.text
@@ -1,49 +1,78 @@
 import re
 from typing import List
 
-from pdfminer.layout import (LTFigure, LTImage, LTLine, LTPage,
+from pdfminer.layout import (LTFigure, LTImage, LTPage,
                              LTTextBoxHorizontal, LTTextLine,
                              LTTextLineHorizontal)
 
 from parsers.parser import Parser
+from parsers.record import LineRecord
 
 heading_pattern = re.compile(r"^([0-9]+(\.)?)+\s*")
 
 class Paragraph:
     SAME_PARAGRAPH = re.compile(r"[^.!?\s]\s*\n$")
     LINE_ENDING = re.compile(r"\S(-|~)\s*\n$")
+    TAIL = 5  # characters the line ending patterns look at
 
     def __init__(self, text: str):
-        self.buffer = list(text)
-        self.add_space()
+        # the text is kept as the appended chunks plus its last characters and
+        # length, so appending a line and checking how the paragraph ends do not
+        # depend on the paragraph size
+        self.chunks: List[str] = []
+        self.length = 0
+        self.tail = ""
+        self.append(text)
         # if not self.remove_hyphen():
         #     self.add_space()
 
+    def push(self, text: str):
+        if text:
+            self.chunks.append(text)
+            self.length += len(text)
+            self.tail = (self.tail + text)[-self.TAIL:]
+
     def pop(self, k=1):
+        if k > self.length:
+            raise IndexError("pop from empty paragraph")
+        self.length -= k
         while k > 0:
-            self.buffer.pop()
-            k -= 1
+            last = self.chunks[-1]
+            if len(last) <= k:
+                self.chunks.pop()
+                k -= len(last)
+            else:
+                self.chunks[-1] = last[:-k]
+                k = 0
+        self.tail = ""
+        for chunk in reversed(self.chunks):
+            self.tail = chunk[-(self.TAIL - len(self.tail)):] + self.tail
+            if len(self.tail) >= self.TAIL:
+                break
 
     def endswith(self, char: str):
-        return self.buffer[-1] == char
+        return self.tail.endswith(char)
 
     def add_space(self):
-        if self.buffer[-1] == "\n" and self.buffer[-2] != " ":
-            self.buffer.insert(-1, " ")
+        if self.tail.endswith("\n") and not self.tail.endswith(" \n"):
+            self.pop()
+            self.push(" \n")
 
     def remove_hyphen(self):
-        hyphen = re.search(self.LINE_ENDING, "".join(self.buffer[-5:]))
+        hyphen = re.search(self.LINE_ENDING, self.tail)
         if hyphen:
             a, b = hyphen.span()  # TODO: "opportunities for pro-"
             self.pop(b - a - 1)
         return hyphen
 
     def same_paragraph(self, next_line: str):
-        return next_line[0].islower() or re.search(self.SAME_PARAGRAPH, "".join(self.buffer[-5:]))
+        return next_line[0].islower() or re.search(self.SAME_PARAGRAPH, self.tail)
         # TODO: [35] -> splits in 2 paragraphs
 
     def get_text(self):
-        return "".join(self.buffer)
+        if len(self.chunks) > 1:
+            self.chunks = ["".join(self.chunks)]
+        return self.chunks[0] if self.chunks else ""
 
     def __str__(self):
         return self.get_text()
@@ -52,7 +81,7 @@ class Paragraph:
         return self.get_text()
 
     def append(self, text: str):
-        self.buffer += list(text)
+        self.push(text)
         self.add_space()
         # if not self.remove_hyphen():
         #     self.add_space()
@@ -63,7 +92,7 @@ class Paragraph:
 
 class Section:
 
-    def __init__(self, heading: LTLine, level=0):
+    def __init__(self, heading: LineRecord, level=0):
         self.heading = heading.get_text().strip()
         self.level = level
         match = re.match(heading_pattern, self.heading)
@@ -90,9 +119,9 @@ class Section:
         else:
             self.paragraphs.append(paragraph)
 
-    def add_heading(self, line: LTLine, level: int) -> bool:
+    def add_heading(self, line: LineRecord, level: int) -> bool:
         if level == self.level:
-            if self.last_paragraph():
+            if self.last_paragraph() is not None:
                 return False
             else:
                 self.last_section().heading += " " + line.get_text().strip()
@@ -111,7 +140,7 @@ class Section:
         return not self.subsections and not self.paragraphs
  
     def remove_empty(self):
-        if sum(len(par.get_text()) for par in self.paragraphs) < 50:
+        if sum(par.length for par in self.paragraphs) < 50:
             self.paragraphs = []
         for section in self.subsections:
             section.remove_empty()
@@ -1,14 +1,17 @@
-from collections import Counter
 from typing import List
 import numpy as np
-from pdfminer.layout import LTLine, LTChar, LTPage, LTTextLineHorizontal, LTCurve, LTRect
+from pdfminer.layout import LTTextLineHorizontal, LTCurve, LTRect
 
+from parsers.geometry import PageGeometry
+from parsers.page import PageObjects
 from parsers.parser import Parser
-from utils.utils import Heading
+from utils.utils import HeadingIndex
 
 
 class SpringerConfParser(Parser):
 
+    FOOTNOTE_WIDTH = 50
+
     def __init__(self):
         super().__init__(1, False)
 
@@ -28,12 +31,18 @@ class SpringerConfParser(Parser):
         else:
             return line.x1 > 300
 
-    def check_heading(self, line: LTTextLineHorizontal, heading_list: List[Heading] = None) -> bool:
+    def limits_mask(self, geometry: PageGeometry, page_index: int = 0, column: int = 0) -> np.ndarray:
+        inside = (geometry.y0 >= 60) & (geometry.y1 <= 630)
+        if page_index == 0:  # no title, authors or affiliations
+            inside &= (geometry.height <= 14) & (geometry.x0 <= 90)
+        if column == 0:
+            return inside & (geometry.x0 < 295)
+        else:
+            return inside & (geometry.x1 > 300)
+
+    def check_heading(self, line: LTTextLineHorizontal, heading_list: HeadingIndex = None) -> bool:
         # bold_fonts = ["KFLRAE+CMBX102", "NHTOVX+CMBX10", "TUEFXF+CMBX104", "MIFCIO+AdvTTeeee58d9.B6"]
-        char_sizes = []
-        potential_subheading = True
-        fonts = Counter([char.fontname for char in line if isinstance(char, LTChar)])
-        font = fonts.most_common()[0][0].lower()
+        font = self.get_font(line)
         potential_subheading = 'cmbx' in font or "bold" in font or ".b" in font
 
         avg_size = self.get_size(line)
@@ -45,18 +54,19 @@ class SpringerConfParser(Parser):
             return True
 
         if potential_subheading:
-            if "." in line.get_text() or 70 < line.x0 < 90:
+            if "." in self.get_text(line) or 70 < line.x0 < 90:
                 return True
         return False
 
-    def exclude_shapes(self, lines: List[LTTextLineHorizontal], page: LTPage, column=0) -> List[LTTextLineHorizontal]:
-        shape_lines = list(sorted(
-            (obj
-             for obj in page
-             # if (isinstance(obj, LTCurve) or isinstance(obj, LTRect)) and
-             if self.check_limits(obj, page.pageid - 1, column)),
-            key=lambda x: (-round(x.y0 / 5), x.x0)))
+    def heading_level(self, line: LTTextLineHorizontal) -> int:
+        level = self.numbering_level(line)
+        if level is not None:
+            return level
+        # unnumbered headings: sections are set larger than subsections
+        return 0 if self.get_size(line) > 10.5 else 1
 
+    def exclude_shapes(self, lines: List[LTTextLineHorizontal], page: PageObjects, column=0) -> List[LTTextLineHorizontal]:
+        # figures are kept for this layout
         # shape_lines = [
         #     obj
         #     for obj in page
@@ -65,38 +75,3 @@ class SpringerConfParser(Parser):
         # ]
         # print(shape_lines)
         return lines
-
-    def exclude_tables_and_footnotes(self, lines: List[LTTextLineHorizontal], page: LTPage, column=0) -> List[
-        LTTextLineHorizontal]:
-        table_lines = [
-            obj
-            for obj in page
-            if isinstance(obj, LTLine) and
-               round(obj.y0 * 10) == round(obj.y1 * 10) and
-               self.check_limits(obj, page.pageid - 1, column)
-        ]
-        tables = {}
-        for line in table_lines:
-            limits = (round(line.x0 * 10), round(line.x1 * 10))
-            if limits not in tables:
-                tables[limits] = []
-            tables[limits].append(line)
-
-        footnotes = [
-            table_lines[0].y0
-            for limits, table_lines in tables.items()
-            if len(table_lines) == 1 and table_lines[0].x1 - table_lines[0].x0 > 50]
-        if len(footnotes) >= 1:
-            min_y = min(footnotes)
-        else:
-            min_y = 60
-        lines = [line for line in lines if line.y0 >= min_y]
-        limits = [
-            (min(table_lines, key=lambda x: x.y0).y0, max(table_lines, key=lambda x: x.y0).y0)
-            for limits, table_lines in tables.items() if len(table_lines) > 1
-        ]
-        return [
-            line
-            for line in lines
-            if all(line.y1 < a or line.y0 > b for a, b in limits)
-        ]
@@ -0,0 +1,67 @@
+import re
+from typing import Tuple
+
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFStream, resolve1
+from pdfminer.psparser import LIT
+
+TEXT = "text"
+IMAGE = "image"  # scanned: images but no text layer at all
+MIXED = "mixed"  # some pages scanned, some with text
+NONE = "none"  # neither text nor images (blank or vector only pages), not a scan
+
+# text objects and the operators showing strings: (abc) Tj, [(a) -2 (bc)] TJ, <0041> Tj, ' and "
+TEXT_OBJECT = re.compile(rb"\bBT\b")
+SHOW_TEXT = re.compile(rb"[)\]>]\s*(?:Tj|TJ|'|\")")
+INLINE_IMAGE = re.compile(rb"\bBI\b")
+
+LITERAL_IMAGE = LIT("Image")
+LITERAL_FORM = LIT("Form")
+
+
+def stream_data(obj) -> bytes:
+    stream = resolve1(obj)
+    return stream.get_data() if isinstance(stream, PDFStream) else b""
+
+
+def scan_content(data: bytes, resources: dict, depth: int = 0) -> Tuple[bool, bool]:
+    # (draws text, draws images) for a content stream and the form xobjects it may use
+    has_text = bool(resolve1((resources or {}).get("Font"))) \
+        and TEXT_OBJECT.search(data) is not None and SHOW_TEXT.search(data) is not None
+    has_image = INLINE_IMAGE.search(data) is not None
+    xobjects = resolve1((resources or {}).get("XObject")) or {}
+    for xobject in xobjects.values():
+        xobject = resolve1(xobject)
+        if not isinstance(xobject, PDFStream):
+            continue
+        subtype = xobject.get("Subtype")
+        if subtype is LITERAL_IMAGE:
+            has_image = True
+        elif subtype is LITERAL_FORM and depth < 2 and not has_text:
+            text, image = scan_content(xobject.get_data(), resolve1(xobject.get("Resources")) or resources, depth + 1)
+            has_text |= text
+            has_image |= image
+    return has_text, has_image
+
+
+def probe_text_layer(pdf_file: str, max_pages: int = 3) -> str:
+    # Looks at the content streams and resources of the first pages, without running the
+    # interpreter or layout analysis: a page has text when it has fonts and shows strings.
+    # OCR'd scans (invisible text over the image) count as text.
+    text_pages = image_pages = 0
+    with open(pdf_file, "rb") as fp:
+        document = PDFDocument(PDFParser(fp), caching=False)
+        for i, page in enumerate(PDFPage.create_pages(document)):
+            if i == max_pages:
+                break
+            data = b"\n".join(stream_data(stream) for stream in page.contents)
+            has_text, has_image = scan_content(data, page.resources)
+            if has_text:
+                text_pages += 1
+            elif has_image:
+                image_pages += 1
+    if not text_pages:
+        return IMAGE if image_pages else NONE
+    return MIXED if image_pages else TEXT
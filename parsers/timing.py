@@ -0,0 +1,85 @@
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, List
+
+
+class StageTimer:
+    # cumulative time and call count per extraction stage, for a file and for each of its pages
+
+    def __init__(self):
+        self.stages: Dict[str, List] = {}
+        self.pages: List[Dict[str, List]] = []
+
+    def start_page(self):
+        self.pages.append({})
+
+    def add(self, name: str, seconds: float):
+        for stats in (self.stages, self.pages[-1]) if self.pages else (self.stages,):
+            entry = stats.setdefault(name, [0., 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - start)
+
+    def iterate_pages(self, pages: Iterable, name: str = "layout") -> Iterator:
+        # starts a page for every item and times producing it, e.g. pdfminer laying it out
+        pages = iter(pages)
+        while True:
+            start = perf_counter()
+            try:
+                page = next(pages)
+            except StopIteration:
+                self.add(name, perf_counter() - start)
+                return
+            self.start_page()
+            self.add(name, perf_counter() - start)
+            yield page
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": stats_to_dict(self.stages),
+            "pages": [stats_to_dict(page) for page in self.pages],
+        }
+
+
+class NullTimer:
+    # stands in for StageTimer when timing is off
+
+    def stage(self, name: str):
+        return nullcontext()
+
+    def iterate_pages(self, pages: Iterable, name: str = "layout") -> Iterable:
+        return pages
+
+
+NULL_TIMER = NullTimer()
+
+
+def stats_to_dict(stats: Dict[str, List]) -> Dict[str, Dict[str, Any]]:
+    return {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in stats.items()}
+
+
+def sum_stages(timings: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    stages = {}
+    for timing in timings:
+        for name, entry in timing["stages"].items():
+            total = stages.setdefault(name, {"seconds": 0., "calls": 0})
+            total["seconds"] += entry["seconds"]
+            total["calls"] += entry["calls"]
+    return stages
+
+
+def combine_timings(timings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # the timings of one file laid out in page ranges, given in page order
+    return {"stages": sum_stages(timings), "pages": [page for timing in timings for page in timing["pages"]]}
+
+
+def merge_timings(timings: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    # per-run aggregate of StageTimer.to_dict() results, keyed by file
+    return {"files": len(timings), "stages": sum_stages(timings.values()), "per_file": timings}
@@ -0,0 +1,72 @@
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+from elasticsearch.client import Elasticsearch
+
+# item statuses worth sending again (rejected by a busy cluster)
+RETRY_STATUSES = {429, 502, 503, 504}
+
+Confirmations = Tuple[List[str], List[Tuple[str, str]]]
+
+
+class BulkSectionWriter:
+    # Buffers the sections of articles and sends them with the bulk api, as partial
+    # updates of the "sections" field only. A batch goes out once it holds max_actions
+    # updates or max_bytes of json. Items rejected by a busy cluster (and whole batches
+    # that fail to get through) are retried with exponential backoff.
+    #
+    # add() and flush() return what the batches sent meanwhile confirmed: the keys of
+    # the updated articles and (key, error) of those that failed for good.
+
+    def __init__(self, es: Elasticsearch, index: str = "articles", max_actions: int = 500,
+                 max_bytes: int = 10 * 1024 * 1024, retries: int = 3, backoff: float = 1.):
+        self.es = es
+        self.index = index
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self.buffer: List[Tuple[str, str, Dict[str, Any]]] = []
+        self.size = 0
+
+    def add(self, key: str, doc_id: str, sections: List[Dict]) -> Confirmations:
+        doc = {"doc": {"sections": sections}}
+        self.buffer.append((key, doc_id, doc))
+        self.size += len(json.dumps(doc))
+        if len(self.buffer) >= self.max_actions or self.size >= self.max_bytes:
+            return self.flush()
+        return [], []
+
+    def flush(self) -> Confirmations:
+        pending, self.buffer, self.size = self.buffer, [], 0
+        indexed, failed = [], []
+        errors: Dict[str, str] = {}
+        for attempt in range(self.retries + 1):
+            if not pending:
+                break
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            operations = []
+            for key, doc_id, doc in pending:
+                operations.append({"update": {"_index": self.index, "_id": doc_id}})
+                operations.append(doc)
+            try:
+                response = self.es.bulk(operations=operations)
+            except Exception as e:
+                for key, _, _ in pending:
+                    errors[key] = repr(e)
+                continue
+            retry = []
+            for item, response_item in zip(pending, response["items"]):
+                result = response_item["update"]
+                if result["status"] < 300:
+                    indexed.append(item[0])
+                elif result["status"] in RETRY_STATUSES:
+                    errors[item[0]] = json.dumps(result.get("error"))
+                    retry.append(item)
+                else:
+                    failed.append((item[0], json.dumps(result.get("error"))))
+            pending = retry
+        failed.extend((key, errors[key]) for key, _, _ in pending)
+        return indexed, failed
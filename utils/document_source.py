@@ -0,0 +1,136 @@
+import abc
+import gzip
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+from elasticsearch.client import Elasticsearch
+
+from utils.scroll import sliced_scroll
+from utils.section_store import SectionStore
+
+Hit = Dict[str, Any]  # {"_id": ..., "_source": {...}}, like the hits of es
+
+
+class DocumentSource:
+    # Where the analysis scripts read articles from: an es index, a local snapshot or the
+    # compressed segments of a SectionStore. Every source yields es-like hits and takes the
+    # same filters: fields that must exist (not empty), fields that must equal a value exactly
+    # (terms, a term query in es) and fields that must match a value (a match query in es).
+
+    @abc.abstractmethod
+    def hits(self, fields: List[str] = None, exists: Iterable[str] = (), terms: Dict[str, Any] = None,
+             **match) -> Iterator[Hit]:
+        pass
+
+    def ids(self, exists: Iterable[str] = (), terms: Dict[str, Any] = None, **match) -> Iterator[str]:
+        for hit in self.hits([], exists, terms, **match):
+            yield hit["_id"]
+
+
+class ElasticsearchSource(DocumentSource):
+
+    def __init__(self, es: Elasticsearch, index: str, slices: int = 4, page_size: int = 500):
+        self.es = es
+        self.index = index
+        self.slices = slices
+        self.page_size = page_size
+
+    def hits(self, fields: List[str] = None, exists: Iterable[str] = (), terms: Dict[str, Any] = None,
+             **match) -> Iterator[Hit]:
+        must = [{"exists": {"field": field}} for field in exists]
+        must += [{"term": {field: value}} for field, value in (terms or {}).items()]
+        must += [{"match": {field: {"query": value}}} for field, value in match.items()]
+        query = {"bool": {"must": must}} if must else {"match_all": {}}
+        return sliced_scroll(self.es, self.index, query, fields, slices=self.slices, page_size=self.page_size)
+
+
+class LocalSource(DocumentSource):
+    # Filters in python what es filters in the query. Fields are not projected:
+    # documents are read one at a time anyway.
+
+    @abc.abstractmethod
+    def read(self) -> Iterator[Dict[str, Any]]:
+        pass
+
+    def hits(self, fields: List[str] = None, exists: Iterable[str] = (), terms: Dict[str, Any] = None,
+             **match) -> Iterator[Hit]:
+        match = dict(terms or {}, **match)  # no analyzers here: both compare whole values
+        for position, document in enumerate(self.read()):
+            # lines of a snapshot are hits, documents of a corpus (eric.json) are bare articles
+            hit = document if "_source" in document else \
+                {"_id": str(document.get("_id", document.get("id", position))), "_source": document}
+            source = hit["_source"]
+            if all(source.get(field) for field in exists) and \
+                    all(source.get(field) == value for field, value in match.items()):
+                yield hit
+
+
+class SnapshotSource(LocalSource):
+    # a jsonl file (gzip if it ends in .gz) with a document per line, or a json
+    # corpus like eric.json: {"corpus": [...]}
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> Iterator[Dict[str, Any]]:
+        if self.path.endswith(".json"):
+            with open(self.path, "rt") as f:
+                yield from json.load(f)["corpus"]
+            return
+        with (gzip.open if self.path.endswith(".gz") else open)(self.path, "rt", encoding="utf-8") as f:
+            for row in f:
+                if row.strip():
+                    yield json.loads(row)
+
+
+class SegmentSource(LocalSource):
+    # The compressed segments of a SectionStore: one hit per article (latest record), with
+    # the sections and filename of the store as its source. The id is the file name without
+    # .pdf (the doi suffix), or with article_ids (e.g. the map a DoiIndex keeps on disk) the
+    # es _id; articles missing from that map are left out. The store keeps nothing else
+    # (title, year, ...), so filters on other fields raise instead of matching nothing.
+
+    FIELDS = ("filename", "sections")
+
+    def __init__(self, folder: str, article_ids: Dict[str, str] = None):
+        self.folder = folder
+        self.article_ids = article_ids
+
+    def hits(self, fields: List[str] = None, exists: Iterable[str] = (), terms: Dict[str, Any] = None,
+             **match) -> Iterator[Hit]:
+        unknown = [field for field in [*exists, *(terms or {}), *match] if field not in self.FIELDS]
+        if unknown:
+            raise ValueError(f"{self.folder}: SectionStore articles have no {', '.join(unknown)}")
+        return super().hits(fields, exists, terms, **match)
+
+    def read(self) -> Iterator[Dict[str, Any]]:
+        for filename, sections in SectionStore(self.folder).records():
+            name = filename[:-4] if filename.endswith(".pdf") else filename
+            if self.article_ids is not None:
+                if name not in self.article_ids:
+                    continue
+                name = self.article_ids[name]
+            yield {"_id": name, "_source": {"filename": filename, "sections": sections}}
+
+
+def open_source(location: str, article_ids: Union[str, Dict[str, str]] = None) -> DocumentSource:
+    # a SectionStore folder or a snapshot file. article_ids (a dict or the json file
+    # of a DoiIndex) maps the files of a SectionStore to their es _id
+    if not os.path.isdir(location):
+        return SnapshotSource(location)
+    if isinstance(article_ids, str):
+        with open(article_ids) as f:
+            article_ids = json.load(f)
+    return SegmentSource(location, article_ids)
+
+
+def write_snapshot(hits: Iterable[Hit], path: str) -> int:
+    # Saves hits (e.g. of an ElasticsearchSource) to a jsonl file (gzip if it ends in .gz)
+    # for offline runs. Returns their number.
+    count = 0
+    with (gzip.open if path.endswith(".gz") else open)(path, "wt", encoding="utf-8") as f:
+        for hit in hits:
+            f.write(json.dumps({"_id": hit["_id"], "_source": hit["_source"]}) + "\n")
+            count += 1
+    return count
@@ -0,0 +1,75 @@
+import json
+import os
+from typing import Dict, Iterable, Optional, Set
+
+from elasticsearch.client import Elasticsearch
+
+from utils.utils import get_entry_by_filename, simplify_doi
+
+
+def doi_keys(doi: str) -> Iterable[str]:
+    # the file names an article may have been saved under: the last segment of its doi
+    # (get_filepath) or the whole doi with "/" replaced (download_pdf)
+    yield doi.split("/")[-1]
+    yield simplify_doi(doi).replace("/", "_")
+
+
+class DoiIndex:
+    # File name -> article _id, loaded with a single scroll over the doi of every
+    # article instead of a leading-wildcard query per file. The map is only loaded by
+    # the first lookup. With a path, it is kept on disk (see save) and the scroll only
+    # runs when the file is missing. Names that are not in the map fall back to the
+    # wildcard query; its answers are kept, misses only for this run.
+
+    def __init__(self, es: Elasticsearch, index: str = "articles", path: str = None, page_size: int = 5000):
+        self.es = es
+        self.index = index
+        self.path = path
+        self.page_size = page_size
+        self._ids: Dict[str, str] = None
+        self.missing: Set[str] = set()
+
+    @property
+    def ids(self) -> Dict[str, str]:
+        if self._ids is None:
+            if self.path and os.path.exists(self.path):
+                with open(self.path) as f:
+                    self._ids = json.load(f)
+            else:
+                self._ids = self.load()
+                self.save()
+        return self._ids
+
+    def load(self) -> Dict[str, str]:
+        ids = {}
+        res = self.es.search(index=self.index, query={"exists": {"field": "doi"}}, source=["doi"],
+                             size=self.page_size, scroll="60s", request_timeout=60)
+        scroll_id = res["_scroll_id"]
+        try:
+            while res["hits"]["hits"]:
+                for hit in res["hits"]["hits"]:
+                    for key in doi_keys(hit["_source"]["doi"]):
+                        ids.setdefault(key, hit["_id"])
+                res = self.es.scroll(scroll_id=scroll_id, scroll="60s")
+                scroll_id = res["_scroll_id"]
+        finally:
+            self.es.clear_scroll(scroll_id=scroll_id)
+        return ids
+
+    def save(self):
+        if self.path and self._ids is not None:
+            with open(self.path, "w") as f:
+                json.dump(self._ids, f)
+
+    def get(self, filename: str) -> Optional[str]:
+        if filename.endswith(".pdf"):
+            filename = filename[:-4]
+        if filename in self.missing:
+            return None
+        if filename not in self.ids:
+            entry = get_entry_by_filename(filename, self.es)
+            if not entry:
+                self.missing.add(filename)
+                return None
+            self.ids[filename] = entry["_id"]
+        return self.ids[filename]
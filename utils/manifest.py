@@ -0,0 +1,79 @@
+import os
+import sqlite3
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from utils.utils import file_sha256
+
+# statuses that are not retried by later runs
+FINISHED = ("done", "empty")
+
+
+class Manifest:
+    # SQLite record of batch extractions, one row per pdf content (sha256), so a
+    # renamed or copied file is not extracted twice. The size and mtime of the last
+    # path seen let restarts skip hashing files that did not change.
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                hash TEXT PRIMARY KEY,
+                path TEXT,
+                size INTEGER,
+                mtime INTEGER,
+                status TEXT,
+                parser TEXT,
+                duration REAL,
+                sections INTEGER,
+                error TEXT,
+                updated TEXT,
+                text_layer TEXT
+            )""")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)")]
+        if "text_layer" not in columns:  # manifests from before the text layer probe
+            self.conn.execute("ALTER TABLE files ADD COLUMN text_layer TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_path ON files (path)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def file_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT hash FROM files WHERE path = ? AND size = ? AND mtime = ?",
+                                (path, stat.st_size, stat.st_mtime_ns)).fetchone()
+        return row[0] if row else file_sha256(path)
+
+    def status(self, file_hash: str) -> Optional[str]:
+        row = self.conn.execute("SELECT status FROM files WHERE hash = ?", (file_hash,)).fetchone()
+        return row[0] if row else None
+
+    def pending(self, files: Iterable[str]) -> List[Tuple[str, str]]:
+        # (path, hash) of the files never seen or not finished (errors, timeouts)
+        result = []
+        for path in files:
+            file_hash = self.file_hash(path)
+            if self.status(file_hash) not in FINISHED:
+                result.append((path, file_hash))
+        return result
+
+    def record(self, file_hash: str, path: str, status: str, parser: str = None, duration: float = None,
+               sections: int = None, error: str = None, text_layer: str = None):
+        stat = os.stat(path)
+        self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                          (file_hash, path, stat.st_size, stat.st_mtime_ns, status, parser, duration, sections,
+                           error, datetime.now().isoformat(timespec="seconds"), text_layer))
+        self.conn.commit()
+
+    def summary(self, column: str = "status") -> Counter:
+        # number of files per status (or per text_layer, parser)
+        return Counter(dict(self.conn.execute(f"SELECT {column}, COUNT(*) FROM files GROUP BY {column}")))
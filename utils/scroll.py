@@ -0,0 +1,63 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List
+
+from elasticsearch.client import Elasticsearch
+
+_DONE = object()
+
+
+def sliced_scroll(es: Elasticsearch, index: str, query: Dict[str, Any], source: List[str] = None,
+                  slices: int = 4, page_size: int = 500, scroll: str = "60s") -> Iterator[Dict[str, Any]]:
+    # Every hit of the query, read by a sliced scroll: one thread per slice, each with
+    # a scroll context of its own (cleared at the end, also when the caller stops early).
+    # Hits come in no particular order. At most two pages per slice wait in memory.
+    pages = queue.Queue(maxsize=2 * slices)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read_slice(slice_id: int):
+        scroll_id = None
+        try:
+            res = es.search(index=index, query=query, source=source, size=page_size, sort=["_doc"],
+                            slice={"id": slice_id, "max": slices} if slices > 1 else None,
+                            scroll=scroll, request_timeout=60)
+            scroll_id = res["_scroll_id"]
+            while res["hits"]["hits"] and not stop.is_set():
+                put(res["hits"]["hits"])
+                res = es.scroll(scroll_id=scroll_id, scroll=scroll)
+                scroll_id = res["_scroll_id"]
+            put(_DONE)
+        except Exception as e:
+            put(e)
+        finally:
+            if scroll_id:
+                try:
+                    es.clear_scroll(scroll_id=scroll_id)
+                except Exception:
+                    pass  # expires on its own after the scroll timeout
+
+    executor = ThreadPoolExecutor(slices)
+    try:
+        for slice_id in range(slices):
+            executor.submit(read_slice, slice_id)
+        done = 0
+        while done < slices:
+            page = pages.get()
+            if page is _DONE:
+                done += 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield from page
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
@@ -0,0 +1,84 @@
+import gzip
+import json
+import os
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Tuple
+
+SectionRecords = List[Dict[str, Any]]
+
+
+def read_segment(path: str) -> Iterator[str]:
+    # the complete lines of a gzip jsonl segment, also of one whose writer died
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for row in f:
+                if row.endswith("\n"):
+                    yield row
+    except (EOFError, zlib.error, gzip.BadGzipFile):
+        pass
+
+
+class SectionStore:
+    # Extraction output on local disk, independent of Elasticsearch: append-only gzip
+    # jsonl segments with one line per article, {"filename": ..., "sections": [...]},
+    # the sections being the flat heading/index/parent/text records of structure_section.
+    # Every writer appends to segments of its own; when an article was stored more than
+    # once, the most recent record wins.
+
+    def __init__(self, folder: str, segment_size: int = 1000):
+        self.folder = folder
+        self.segment_size = segment_size
+        self._segment = None
+        self._count = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def append(self, filename: str, sections: SectionRecords):
+        if self._segment is None or self._count == self.segment_size:
+            self.close()
+            name = f"{time.time_ns()}-{os.getpid()}.jsonl.gz"
+            self._segment = gzip.open(os.path.join(self.folder, name), "wt", encoding="utf-8")
+            self._count = 0
+        self._segment.write(json.dumps({"filename": filename, "sections": sections}) + "\n")
+        # a sync flush keeps every stored record readable if the process dies
+        self._segment.flush()
+        self._count += 1
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def segments(self) -> List[str]:
+        # names start with the creation time, so this is the order they were written in
+        return sorted(os.path.join(self.folder, name) for name in os.listdir(self.folder)
+                      if name.endswith(".jsonl.gz"))
+
+    def latest(self) -> Dict[str, Tuple[str, int]]:
+        # filename -> (segment, line) of its most recent record
+        latest = {}
+        for path in self.segments():
+            for row, line in enumerate(read_segment(path)):
+                latest[json.loads(line)["filename"]] = (path, row)
+        return latest
+
+    def records(self, latest: Dict[str, Tuple[str, int]] = None) -> Iterator[Tuple[str, SectionRecords]]:
+        # (filename, sections) of every article, latest record only. Positions are
+        # collected first, so only one article at a time is held in memory.
+        latest = self.latest() if latest is None else latest
+        wanted = {}
+        for filename, position in latest.items():
+            wanted.setdefault(position[0], set()).add(position[1])
+        for path in self.segments():
+            if path not in wanted:
+                continue
+            for row, line in enumerate(read_segment(path)):
+                if row in wanted[path]:
+                    record = json.loads(line)
+                    yield record["filename"], record["sections"]
@@ -1,6 +1,7 @@
+import hashlib
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 from elasticsearch.client import Elasticsearch
 
 import requests
@@ -15,6 +16,39 @@ class Heading:
         self.subheadings = subheadings
 
 
+class HeadingIndex:
+    # Outline titles indexed by word. A line inside a title has all its inner words
+    # (every word but the first and the last, which may be cut) as whole words of
+    # that title, so only the titles sharing its rarest inner word are compared.
+
+    def __init__(self, headings: List[Heading]):
+        self.titles: List[Tuple[str, Heading]] = []
+        for heading in headings:
+            self.titles.append((" ".join(heading.title.split()), heading))
+            for subheading in heading.subheadings:
+                self.titles.append((" ".join(subheading.title.split()), heading))
+        self.words: Dict[str, List[Tuple[str, Heading]]] = {}
+        for title, heading in self.titles:
+            for word in set(title.split()):
+                self.words.setdefault(word, []).append((title, heading))
+
+    def __bool__(self):
+        return bool(self.titles)
+
+    def find(self, text: str) -> Heading:
+        words = text.split()
+        if not words:
+            return None
+        text = " ".join(words)
+        candidates = self.titles
+        if len(words) > 2:
+            candidates = min((self.words.get(word, []) for word in words[1:-1]), key=len)
+        for title, heading in candidates:
+            if text in title:
+                return heading
+        return None
+
+
 def get_meta_info(soup, meta_name):
     info = soup.find("meta", attrs={'name': meta_name})
     info = info["content"] if info is not None else None
@@ -71,6 +105,14 @@ def get_filepath(article: Dict[str, Any]) -> str:
         return None
 
 
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
 def simplify_doi(doi: str):
     return "/".join(doi.split("/")[-2:])
 
@@ -79,7 +121,6 @@ def get_entry_by_filename(filename: str, es: Elasticsearch):
     if filename.endswith(".pdf"):
         filename = filename[:-4]
     result = es.search(index="articles", query={"wildcard": {"doi": {"value": "*" + filename}}})
-    return result["hits"]["hits"][0]
     result = result["hits"]["hits"]
     return result[0] if result else None
 